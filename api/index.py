@@ -1,6 +1,7 @@
 """
 Vercel serverless function entry point for Flask app.
 """
+import logging
 import os
 import sys
 from pathlib import Path
@@ -16,6 +17,17 @@ sys.path.insert(0, str(parent_dir))
 os.environ['APP_BASE_DIR'] = str(parent_dir)
 
 from app import app
+from services.firestore_service import get_firestore_service
+from services.storage_service import get_storage_service
+
+# Build the service clients during the cold-start init phase instead of the
+# first user request. Importing app has loaded .env by now; a failure here is
+# logged and left for the first request to retry rather than crashing the function.
+try:
+    get_firestore_service()
+    get_storage_service()
+except Exception as e:
+    logging.getLogger(__name__).warning("Service warmup failed: %s", e)
 
 # Export the Flask app for Vercel
 # Vercel expects 'app' to be the WSGI application
@@ -1,7 +1,12 @@
+import hashlib
 import logging
 import os
+import tempfile
+from decimal import Decimal
 from pathlib import Path
 from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from jinja2 import FileSystemBytecodeCache
 
 try:
     from dotenv import load_dotenv
@@ -9,17 +14,79 @@ try:
 except ImportError:
     DOTENV_AVAILABLE = False
 
+# Load .env before importing the routes: services read their settings from the
+# environment when their modules are imported
+if DOTENV_AVAILABLE:
+    load_dotenv()
+
+try:
+    from flask_compress import Compress
+    COMPRESS_AVAILABLE = True
+except ImportError:
+    COMPRESS_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from routes.report_routes import report_bp
 from routes.map_routes import map_bp
 from routes.admin_routes import admin_bp
 from routes.auth_routes import auth_bp
+from services.auth_service import auth_disabled
+
+
+# Page templates compiled at startup
+PRECOMPILED_TEMPLATES = ("index.html", "report.html", "map.html", "admin.html", "login.html")
+
+
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson, used for every jsonify() response."""
+
+    option = (orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if ORJSON_AVAILABLE else 0
+
+    @staticmethod
+    def _default(obj):
+        # orjson skips datetime subclasses such as Firestore's DatetimeWithNanoseconds
+        if hasattr(obj, "isoformat"):
+            return obj.isoformat()
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if hasattr(obj, "__html__"):
+            return str(obj.__html__())
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=self._default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+class ISOJSONProvider(DefaultJSONProvider):
+    """Stdlib JSON provider that writes datetimes as ISO 8601, like ORJSONProvider."""
+
+    @staticmethod
+    def default(obj):
+        if hasattr(obj, "isoformat"):
+            return obj.isoformat()
+        return DefaultJSONProvider.default(obj)
+
+
+def _static_version(static_dir: Path) -> str:
+    """Hash the static files so their URLs change whenever any of them do."""
+    digest = hashlib.md5()
+    for path in sorted(static_dir.rglob("*")):
+        if path.is_file():
+            digest.update(path.relative_to(static_dir).as_posix().encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:10]
 
 
 def create_app() -> Flask:
     """Create and configure the Flask app."""
-    if DOTENV_AVAILABLE:
-        load_dotenv()
-
     # Get the base directory - use APP_BASE_DIR env var if set (Vercel), otherwise use file location
     base_dir = Path(os.environ.get('APP_BASE_DIR', Path(__file__).parent.absolute()))
     
@@ -29,14 +96,49 @@ def create_app() -> Flask:
         template_folder=str(base_dir / "templates"),
         static_url_path='/static'
     )
+    app.json = ORJSONProvider(app) if ORJSON_AVAILABLE else ISOJSONProvider(app)
 
     # Basic configuration
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-key")
+    # Only re-sign the session cookie when the session actually changes
+    app.config["SESSION_REFRESH_EACH_REQUEST"] = False
     app.config["GOOGLE_CLOUD_PROJECT"] = os.environ.get("GOOGLE_CLOUD_PROJECT", "")
     app.config["GCS_BUCKET"] = os.environ.get("GCS_BUCKET", "")
     app.config["GOOGLE_MAPS_API_KEY"] = os.environ.get("GOOGLE_MAPS_API_KEY", "")
     app.config["GEMINI_API_KEY"] = os.environ.get("GEMINI_API_KEY", "")
     
+    # Bound request bodies: 16MB images, plus base64 overhead for legacy JSON clients
+    app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 24 * 1024 * 1024))
+    
+    # Static assets are versioned by content hash, so browsers can cache them for a year
+    app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+    static_version = _static_version(base_dir / "static")
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint == "static":
+            values.setdefault("v", static_version)
+    
+    # Templates only need re-checking on disk while developing
+    app.config["TEMPLATES_AUTO_RELOAD"] = os.environ.get("FLASK_DEBUG", "false").lower() == "true"
+    app.jinja_env.auto_reload = app.config["TEMPLATES_AUTO_RELOAD"]
+
+    # Persist compiled template bytecode so cold starts skip parsing
+    jinja_cache_dir = os.environ.get("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "infrabeacon-jinja"))
+    try:
+        os.makedirs(jinja_cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+    except OSError as e:
+        logging.getLogger(__name__).warning("Jinja bytecode cache disabled: %s", e)
+    
+    # Compress JSON API responses; small ones like /healthz aren't worth it
+    if COMPRESS_AVAILABLE:
+        app.config["COMPRESS_MIMETYPES"] = ["application/json"]
+        app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+        app.config["COMPRESS_BR_LEVEL"] = 4
+        app.config["COMPRESS_MIN_SIZE"] = 1024
+        Compress(app)
+    
     # Firebase configuration
     app.config["FIREBASE_API_KEY"] = os.environ.get("FIREBASE_API_KEY", "")
     app.config["FIREBASE_AUTH_DOMAIN"] = os.environ.get("FIREBASE_AUTH_DOMAIN", "")
@@ -46,6 +148,8 @@ def create_app() -> Flask:
 
     # Logging
     logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
+    if auth_disabled():
+        logging.getLogger(__name__).warning("Admin login is disabled (AUTH_DISABLED=1); admin pages are open")
 
     # Blueprints
     app.register_blueprint(report_bp)
@@ -58,6 +162,10 @@ def create_app() -> Flask:
     def health_check():
         return jsonify({"status": "ok"})
 
+    # Compile templates up front so the first request doesn't pay for it
+    for template in PRECOMPILED_TEMPLATES:
+        app.jinja_env.get_template(template)
+
     return app
 
 
@@ -10,9 +10,11 @@ All routes are protected with authentication.
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Blueprint, request, jsonify, render_template, current_app, session
 
-from services.firestore_service import get_firestore_service
+from services.firestore_service import get_firestore_service, encode_cursor
 from services.storage_service import get_storage_service
 from services.auth_service import login_required
 
@@ -20,6 +22,15 @@ logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__)
 
+# Fields admins may update, and their valid values
+_ALLOWED_UPDATE = frozenset(('status', 'notes', 'severity', 'issue_type'))
+_BULK_ALLOWED = frozenset(('status', 'severity'))
+_VALID_STATUS = frozenset(('new', 'verified', 'resolved'))
+_VALID_SEVERITY = frozenset(('low', 'medium', 'high'))
+
+# Pool for running independent storage/database calls concurrently
+_EXEC = ThreadPoolExecutor(max_workers=4, thread_name_prefix='admin')
+
 
 @admin_bp.route('/')
 @login_required
@@ -41,7 +52,8 @@ def get_all_reports():
     - status: Filter by status
     - issue_type: Filter by issue type
     - severity: Filter by severity
-    - page: Page number (for pagination)
+    - cursor: next_cursor from the previous page (cursor pagination;
+      page/offset parameters are not supported)
     - limit: Reports per page
     """
     try:
@@ -51,29 +63,31 @@ def get_all_reports():
         issue_type = request.args.get('issue_type')
         severity = request.args.get('severity')
         limit = int(request.args.get('limit', 50))
+        cursor = request.args.get('cursor')
         
-        reports = firestore.get_all_reports(
-            status=status,
-            issue_type=issue_type,
-            severity=severity,
-            limit=limit
-        )
+        try:
+            reports = firestore.get_all_reports(
+                status=status,
+                issue_type=issue_type,
+                severity=severity,
+                limit=limit,
+                start_after=cursor
+            )
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
         
-        # Convert datetime objects and add extra info
-        for report in reports:
-            if 'created_at' in report:
-                report['created_at'] = report['created_at'].isoformat() if hasattr(report['created_at'], 'isoformat') else str(report['created_at'])
-            if 'updated_at' in report:
-                report['updated_at'] = report['updated_at'].isoformat() if hasattr(report['updated_at'], 'isoformat') else str(report['updated_at'])
+        # A full page means there may be more reports after it
+        next_cursor = encode_cursor(reports[-1]) if reports and len(reports) == limit else None
         
         return jsonify({
             'success': True,
             'reports': reports,
-            'count': len(reports)
+            'count': len(reports),
+            'next_cursor': next_cursor
         })
     
     except Exception as e:
-        logger.error(f"Failed to get admin reports: {e}")
+        logger.error("Failed to get admin reports: %s", e)
         return jsonify({'error': 'Failed to get reports'}), 500
 
 
@@ -93,42 +107,30 @@ def update_report(report_id):
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data provided'}), 400
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         
         # Allowed fields for update
-        allowed_fields = ['status', 'notes', 'severity', 'issue_type']
-        updates = {}
-        
-        for field in allowed_fields:
-            if field in data:
-                updates[field] = data[field]
+        updates = {field: data[field] for field in _ALLOWED_UPDATE & data.keys()}
         
         if not updates:
             return jsonify({'error': 'No valid fields to update'}), 400
         
         # Validate status
-        if 'status' in updates:
-            valid_statuses = ['new', 'verified', 'resolved']
-            if updates['status'] not in valid_statuses:
-                return jsonify({'error': f'Invalid status. Must be one of: {valid_statuses}'}), 400
+        if 'status' in updates and updates['status'] not in _VALID_STATUS:
+            return jsonify({'error': f'Invalid status. Must be one of: {sorted(_VALID_STATUS)}'}), 400
         
         # Validate severity
-        if 'severity' in updates:
-            valid_severities = ['low', 'medium', 'high']
-            if updates['severity'] not in valid_severities:
-                return jsonify({'error': f'Invalid severity. Must be one of: {valid_severities}'}), 400
+        if 'severity' in updates and updates['severity'] not in _VALID_SEVERITY:
+            return jsonify({'error': f'Invalid severity. Must be one of: {sorted(_VALID_SEVERITY)}'}), 400
         
         success = firestore.update_report(report_id, updates)
         
         if success:
             # Get updated report
             report = firestore.get_report(report_id)
-            if report:
-                if 'created_at' in report:
-                    report['created_at'] = report['created_at'].isoformat() if hasattr(report['created_at'], 'isoformat') else str(report['created_at'])
-                if 'updated_at' in report:
-                    report['updated_at'] = report['updated_at'].isoformat() if hasattr(report['updated_at'], 'isoformat') else str(report['updated_at'])
             
-            logger.info(f"Updated report {report_id}: {updates}")
+            logger.info("Updated report %s: %s", report_id, updates)
             return jsonify({
                 'success': True,
                 'report': report
@@ -137,7 +139,7 @@ def update_report(report_id):
             return jsonify({'error': 'Failed to update report'}), 500
     
     except Exception as e:
-        logger.error(f"Failed to update report {report_id}: {e}")
+        logger.error("Failed to update report %s: %s", report_id, e)
         return jsonify({'error': 'Failed to update report'}), 500
 
 
@@ -154,22 +156,27 @@ def delete_report(report_id):
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        # Delete image from storage
+        # Delete image from storage in the background
+        image_future = None
         image_url = report.get('image_url')
         if image_url and not image_url.startswith('data:'):
-            storage.delete_image(image_url)
+            image_future = _EXEC.submit(storage.delete_image, image_url)
         
-        # Delete report from Firestore
+        # Delete report from Firestore while the image delete is in flight
         success = firestore.delete_report(report_id)
         
+        # A stale image URL shouldn't fail the report delete
+        if image_future and not image_future.result():
+            logger.warning("Failed to delete image for report %s", report_id)
+        
         if success:
-            logger.info(f"Deleted report {report_id}")
+            logger.info("Deleted report %s", report_id)
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Failed to delete report'}), 500
     
     except Exception as e:
-        logger.error(f"Failed to delete report {report_id}: {e}")
+        logger.error("Failed to delete report %s: %s", report_id, e)
         return jsonify({'error': 'Failed to delete report'}), 500
 
 
@@ -189,13 +196,13 @@ def resolve_report(report_id):
         })
         
         if success:
-            logger.info(f"Resolved report {report_id}")
+            logger.info("Resolved report %s", report_id)
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Failed to resolve report'}), 500
     
     except Exception as e:
-        logger.error(f"Failed to resolve report {report_id}: {e}")
+        logger.error("Failed to resolve report %s: %s", report_id, e)
         return jsonify({'error': 'Failed to resolve report'}), 500
 
 
@@ -211,13 +218,13 @@ def verify_report(report_id):
         })
         
         if success:
-            logger.info(f"Verified report {report_id}")
+            logger.info("Verified report %s", report_id)
             return jsonify({'success': True})
         else:
             return jsonify({'error': 'Failed to verify report'}), 500
     
     except Exception as e:
-        logger.error(f"Failed to verify report {report_id}: {e}")
+        logger.error("Failed to verify report %s: %s", report_id, e)
         return jsonify({'error': 'Failed to verify report'}), 500
 
 
@@ -247,23 +254,21 @@ def bulk_update_reports():
             return jsonify({'error': 'No updates provided'}), 400
         
         # Allowed fields
-        allowed_fields = ['status', 'severity']
-        filtered_updates = {k: v for k, v in updates.items() if k in allowed_fields}
+        filtered_updates = {k: v for k, v in updates.items() if k in _BULK_ALLOWED}
         
         if not filtered_updates:
             return jsonify({'error': 'No valid fields to update'}), 400
         
-        # Update each report
-        success_count = 0
-        failed_ids = []
-        
-        for report_id in report_ids:
-            if firestore.update_report(report_id, filtered_updates):
-                success_count += 1
-            else:
-                failed_ids.append(report_id)
+        if 'status' in filtered_updates and filtered_updates['status'] not in _VALID_STATUS:
+            return jsonify({'error': f'Invalid status. Must be one of: {sorted(_VALID_STATUS)}'}), 400
+        if 'severity' in filtered_updates and filtered_updates['severity'] not in _VALID_SEVERITY:
+            return jsonify({'error': f'Invalid severity. Must be one of: {sorted(_VALID_SEVERITY)}'}), 400
         
-        logger.info(f"Bulk updated {success_count}/{len(report_ids)} reports")
+        # Update all reports in batched writes
+        failed_ids = firestore.bulk_update_reports(report_ids, filtered_updates)
+        success_count = len(report_ids) - len(failed_ids)
+
+        logger.info("Bulk updated %s/%s reports", success_count, len(report_ids))
         
         return jsonify({
             'success': True,
@@ -272,5 +277,5 @@ def bulk_update_reports():
         })
     
     except Exception as e:
-        logger.error(f"Failed to bulk update reports: {e}")
+        logger.error("Failed to bulk update reports: %s", e)
         return jsonify({'error': 'Failed to bulk update reports'}), 500
@@ -70,7 +70,7 @@ def verify_token():
         # Get redirect URL
         next_url = session.pop('next_url', None) or url_for('admin.admin_dashboard')
         
-        logger.info(f"Admin login successful: {email}")
+        logger.info("Admin login successful: %s", email)
         
         return jsonify({
             'success': True,
@@ -82,7 +82,7 @@ def verify_token():
         })
     
     except Exception as e:
-        logger.error(f"Token verification failed: {e}")
+        logger.error("Token verification failed: %s", e)
         return jsonify({'error': 'Authentication failed'}), 500
 
 
@@ -97,7 +97,7 @@ def logout():
     session.pop('admin_uid', None)
     session.pop('admin_name', None)
     
-    logger.info(f"Admin logout: {email}")
+    logger.info("Admin logout: %s", email)
     
     return redirect(url_for('report.index'))
 
@@ -8,7 +8,12 @@ Handles map visualization endpoints:
 """
 
 import logging
-from flask import Blueprint, request, jsonify, render_template, current_app
+from bisect import bisect_right
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from flask import Blueprint, Response, request, jsonify, render_template, current_app, stream_with_context
 
 from services.firestore_service import get_firestore_service
 
@@ -16,6 +21,78 @@ logger = logging.getLogger(__name__)
 
 map_bp = Blueprint('map', __name__)
 
+# Marker icon color based on severity
+_SEV_COLORS = {
+    'high': '#dc3545',    # Red
+    'medium': '#ffc107',  # Yellow
+    'low': '#28a745'      # Green
+}
+
+# Marker icon based on status
+_STATUS_ICONS = {
+    'new': '🔴',
+    'verified': '🟡',
+    'resolved': '🟢'
+}
+
+# Report fields fetched for markers and clusters
+_MARKER_FIELDS = [
+    'id', 'latitude', 'longitude', 'severity', 'status',
+    'issue_type', 'description', 'image_url', 'created_at'
+]
+_CLUSTER_FIELDS = ['id', 'latitude', 'longitude', 'severity']
+
+# Level tables for the columnar marker payload
+_SEVERITY_LEVELS = list(_SEV_COLORS)
+_STATUS_LEVELS = list(_STATUS_ICONS)
+_SEVERITY_INDEX = {level: i for i, level in enumerate(_SEVERITY_LEVELS)}
+_STATUS_INDEX = {level: i for i, level in enumerate(_STATUS_LEVELS)}
+
+# Severity weights for cluster averages
+_SEVERITY_WEIGHTS = {'high': 3, 'medium': 2, 'low': 1}
+
+# Cluster grid size (degrees) by zoom level: _GRID_SIZES[i] applies to
+# zooms below _ZOOM_BREAKS[i]; the last size applies to all higher zooms
+_ZOOM_BREAKS = (5, 8, 11, 14)
+_GRID_SIZES = (
+    5.0,    # Very zoomed out - 5 degree grid
+    1.0,    # Zoomed out - 1 degree grid
+    0.1,    # Medium zoom - 0.1 degree grid
+    0.01,   # Zoomed in - 0.01 degree grid
+    0.001   # Very zoomed in - 0.001 degree grid
+)
+
+# Chunk size for streaming proxied images
+_PROXY_CHUNK_SIZE = 64 * 1024
+
+# Shared HTTP session for the image proxy so connections (TCP + TLS) are
+# kept alive and reused across requests
+_HTTP = requests.Session()
+_HTTP.headers['User-Agent'] = 'InfraBeacon-ImageProxy/1.0'
+_http_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=2)
+_HTTP.mount('https://', _http_adapter)
+_HTTP.mount('http://', _http_adapter)
+
+
+def _parse_bounds():
+    """Parse the 'bounds' query parameter (north,south,east,west) if provided."""
+    bounds_param = request.args.get('bounds')
+    if not bounds_param:
+        return None
+    
+    try:
+        parts = bounds_param.split(',')
+        if len(parts) == 4:
+            return {
+                'north': float(parts[0]),
+                'south': float(parts[1]),
+                'east': float(parts[2]),
+                'west': float(parts[3])
+            }
+    except ValueError:
+        pass
+    return None
+
 
 @map_bp.route('/')
 def map_page():
@@ -39,58 +116,57 @@ def get_map_markers():
         
         status = request.args.get('status')
         issue_type = request.args.get('issue_type')
+        bounds = _parse_bounds()
         
-        reports = firestore.get_all_reports(
-            status=status,
-            issue_type=issue_type,
-            limit=500
-        )
+        if bounds:
+            # Only fetch reports inside the viewport
+            reports = firestore.get_reports_in_bounds(
+                bounds,
+                status=status,
+                issue_type=issue_type,
+                limit=500,
+                fields=_MARKER_FIELDS
+            )
+        else:
+            reports = firestore.get_all_reports(
+                status=status,
+                issue_type=issue_type,
+                limit=500,
+                fields=_MARKER_FIELDS
+            )
         
-        # Convert to marker format
-        markers = []
-        for report in reports:
-            lat = report.get('latitude')
-            lng = report.get('longitude')
-            
-            if lat is None or lng is None:
-                continue
-            
-            # Icon color based on severity
-            severity_colors = {
-                'high': '#dc3545',    # Red
-                'medium': '#ffc107',  # Yellow
-                'low': '#28a745'      # Green
-            }
-            
-            # Status icons
-            status_icons = {
-                'new': '🔴',
-                'verified': '🟡',
-                'resolved': '🟢'
-            }
-            
-            markers.append({
-                'id': report.get('id'),
-                'lat': lat,
-                'lng': lng,
-                'issue_type': report.get('issue_type', 'other'),
-                'severity': report.get('severity', 'medium'),
-                'status': report.get('status', 'new'),
-                'description': report.get('description', ''),
-                'image_url': report.get('image_url', ''),
-                'color': severity_colors.get(report.get('severity', 'medium'), '#ffc107'),
-                'icon': status_icons.get(report.get('status', 'new'), '🔴'),
-                'created_at': report.get('created_at').isoformat() if hasattr(report.get('created_at'), 'isoformat') else str(report.get('created_at', ''))
-            })
+        points = [
+            r for r in reports
+            if r.get('latitude') is not None and r.get('longitude') is not None
+        ]
+        
+        # Columnar marker format: one array per field instead of repeating
+        # every key per marker. Severity and status are indices into the
+        # level tables sent alongside.
+        markers = {
+            'ids': [r.get('id') for r in points],
+            'lats': [r['latitude'] for r in points],
+            'lngs': [r['longitude'] for r in points],
+            'issue_types': [r.get('issue_type', 'other') for r in points],
+            'severities': [_SEVERITY_INDEX.get(r.get('severity'), _SEVERITY_INDEX['medium']) for r in points],
+            'statuses': [_STATUS_INDEX.get(r.get('status'), _STATUS_INDEX['new']) for r in points],
+            'descriptions': [r.get('description', '') for r in points],
+            'image_urls': [r.get('image_url', '') for r in points],
+            'created_at': [r.get('created_at', '') for r in points]
+        }
         
         return jsonify({
             'success': True,
             'markers': markers,
-            'count': len(markers)
+            'count': len(points),
+            'severity_levels': _SEVERITY_LEVELS,
+            'severity_colors': [_SEV_COLORS[s] for s in _SEVERITY_LEVELS],
+            'status_levels': _STATUS_LEVELS,
+            'status_icons': [_STATUS_ICONS[s] for s in _STATUS_LEVELS]
         })
     
     except Exception as e:
-        logger.error(f"Failed to get map markers: {e}")
+        logger.error("Failed to get map markers: %s", e)
         return jsonify({'error': 'Failed to get markers'}), 500
 
 
@@ -106,21 +182,7 @@ def get_heatmap_data():
     try:
         firestore = get_firestore_service()
         
-        # Parse bounds if provided
-        bounds = None
-        bounds_param = request.args.get('bounds')
-        if bounds_param:
-            try:
-                parts = bounds_param.split(',')
-                if len(parts) == 4:
-                    bounds = {
-                        'north': float(parts[0]),
-                        'south': float(parts[1]),
-                        'east': float(parts[2]),
-                        'west': float(parts[3])
-                    }
-            except ValueError:
-                pass
+        bounds = _parse_bounds()
         
         heatmap_data = firestore.get_reports_for_heatmap(bounds=bounds)
         
@@ -131,7 +193,7 @@ def get_heatmap_data():
         })
     
     except Exception as e:
-        logger.error(f"Failed to get heatmap data: {e}")
+        logger.error("Failed to get heatmap data: %s", e)
         return jsonify({'error': 'Failed to get heatmap data'}), 500
 
 
@@ -148,42 +210,8 @@ def get_stats():
     try:
         firestore = get_firestore_service()
         
-        # Get all reports for statistics
-        reports = firestore.get_all_reports(limit=1000)
-        
-        # Calculate statistics
-        stats = {
-            'total': len(reports),
-            'by_status': {
-                'new': 0,
-                'verified': 0,
-                'resolved': 0
-            },
-            'by_type': {
-                'pothole': 0,
-                'broken_light': 0,
-                'garbage': 0,
-                'waterlogging': 0,
-                'other': 0
-            },
-            'by_severity': {
-                'high': 0,
-                'medium': 0,
-                'low': 0
-            }
-        }
-        
-        for report in reports:
-            status = report.get('status', 'new')
-            issue_type = report.get('issue_type', 'other')
-            severity = report.get('severity', 'medium')
-            
-            if status in stats['by_status']:
-                stats['by_status'][status] += 1
-            if issue_type in stats['by_type']:
-                stats['by_type'][issue_type] += 1
-            if severity in stats['by_severity']:
-                stats['by_severity'][severity] += 1
+        # Counts are aggregated by Firestore
+        stats = firestore.get_stats()
         
         return jsonify({
             'success': True,
@@ -191,7 +219,7 @@ def get_stats():
         })
     
     except Exception as e:
-        logger.error(f"Failed to get stats: {e}")
+        logger.error("Failed to get stats: %s", e)
         return jsonify({'error': 'Failed to get stats'}), 500
 
 
@@ -211,63 +239,47 @@ def get_clusters():
         
         zoom = int(request.args.get('zoom', 10))
         
-        reports = firestore.get_all_reports(limit=500)
+        reports = firestore.get_all_reports(limit=500, fields=_CLUSTER_FIELDS)
         
         # Simple grid-based clustering
-        # Grid size depends on zoom level
-        grid_sizes = {
-            range(0, 5): 5.0,     # Very zoomed out - 5 degree grid
-            range(5, 8): 1.0,     # Zoomed out - 1 degree grid
-            range(8, 11): 0.1,    # Medium zoom - 0.1 degree grid
-            range(11, 14): 0.01,  # Zoomed in - 0.01 degree grid
-            range(14, 20): 0.001  # Very zoomed in - 0.001 degree grid
-        }
+        # Grid size depends on zoom level, clamped to the nearest bucket
+        grid_size = _GRID_SIZES[bisect_right(_ZOOM_BREAKS, zoom)]
         
-        grid_size = 0.01
-        for zoom_range, size in grid_sizes.items():
-            if zoom in zoom_range:
-                grid_size = size
-                break
+        # Group reports into grid cells, vectorized over all reports
+        points = [r for r in reports if r.get('latitude') is not None and r.get('longitude') is not None]
+        cluster_list = []
         
-        # Group reports into grid cells
-        clusters = {}
-        for report in reports:
-            lat = report.get('latitude')
-            lng = report.get('longitude')
+        if points:
+            n = len(points)
+            lats = np.fromiter((r['latitude'] for r in points), dtype=np.float64, count=n)
+            lngs = np.fromiter((r['longitude'] for r in points), dtype=np.float64, count=n)
+            weights = np.fromiter(
+                (_SEVERITY_WEIGHTS.get(r.get('severity', 'medium'), 2) for r in points),
+                dtype=np.int32, count=n
+            )
             
-            if lat is None or lng is None:
-                continue
+            # Pack both grid cell indices into a single int64 key per report
+            cell_lat = np.round(lats / grid_size).astype(np.int64)
+            cell_lng = np.round(lngs / grid_size).astype(np.int64)
+            keys = (cell_lat << 32) | (cell_lng & 0xFFFFFFFF)
             
-            # Calculate grid cell
-            grid_lat = round(lat / grid_size) * grid_size
-            grid_lng = round(lng / grid_size) * grid_size
-            grid_key = f"{grid_lat},{grid_lng}"
+            _, first, inverse, counts = np.unique(
+                keys, return_index=True, return_inverse=True, return_counts=True
+            )
+            severity_sums = np.bincount(inverse, weights=weights)
+            members = np.split(np.argsort(inverse, kind='stable'), np.cumsum(counts)[:-1])
             
-            if grid_key not in clusters:
-                clusters[grid_key] = {
-                    'lat': grid_lat,
-                    'lng': grid_lng,
-                    'count': 0,
-                    'reports': [],
-                    'severity_sum': 0
+            # Keep clusters in order of first appearance
+            cluster_list = [
+                {
+                    'lat': int(cell_lat[first[c]]) * grid_size,
+                    'lng': int(cell_lng[first[c]]) * grid_size,
+                    'count': int(counts[c]),
+                    'avg_severity': float(severity_sums[c] / counts[c]),
+                    'report_ids': [points[i].get('id') for i in members[c][:10]]  # Limit report IDs
                 }
-            
-            severity_weights = {'high': 3, 'medium': 2, 'low': 1}
-            clusters[grid_key]['count'] += 1
-            clusters[grid_key]['reports'].append(report.get('id'))
-            clusters[grid_key]['severity_sum'] += severity_weights.get(report.get('severity', 'medium'), 2)
-        
-        # Convert to list and calculate average severity
-        cluster_list = []
-        for cluster in clusters.values():
-            avg_severity = cluster['severity_sum'] / cluster['count'] if cluster['count'] > 0 else 2
-            cluster_list.append({
-                'lat': cluster['lat'],
-                'lng': cluster['lng'],
-                'count': cluster['count'],
-                'avg_severity': avg_severity,
-                'report_ids': cluster['reports'][:10]  # Limit report IDs
-            })
+                for c in np.argsort(first)
+            ]
         
         return jsonify({
             'success': True,
@@ -278,7 +290,7 @@ def get_clusters():
         })
     
     except Exception as e:
-        logger.error(f"Failed to get clusters: {e}")
+        logger.error("Failed to get clusters: %s", e)
         return jsonify({'error': 'Failed to get clusters'}), 500
 
 
@@ -290,32 +302,61 @@ def proxy_image():
     Query parameters:
     - url: The image URL to proxy
     """
-    import requests
-    from flask import Response
-    
     image_url = request.args.get('url')
     if not image_url:
         return jsonify({'error': 'No URL provided'}), 400
     
     try:
+        # Forward the client's validators so the origin can answer 304
+        upstream_headers = {
+            name: request.headers[name]
+            for name in ('If-None-Match', 'If-Modified-Since')
+            if name in request.headers
+        }
+        if_none_match = request.headers.get('If-None-Match')
+        
         # Fetch the image
-        response = requests.get(image_url, timeout=10, stream=True)
+        response = _HTTP.get(image_url, timeout=10, stream=True, headers=upstream_headers)
+        
+        headers = {
+            'Cache-Control': 'public, max-age=86400',  # Cache for 1 day
+            'Access-Control-Allow-Origin': '*'
+        }
+        
+        # Also short-circuit if the origin ignored the validator but the ETag matches
+        etag = response.headers.get('ETag')
+        if response.status_code == 304 or (etag and if_none_match == etag):
+            response.close()
+            headers['ETag'] = etag or if_none_match
+            return '', 304, headers
         
         if response.status_code != 200:
+            response.close()
             return jsonify({'error': 'Failed to fetch image'}), response.status_code
         
         # Get content type
         content_type = response.headers.get('Content-Type', 'image/jpeg')
         
-        # Return the image with proper headers
+        for name in ('ETag', 'Last-Modified'):
+            if name in response.headers:
+                headers[name] = response.headers[name]
+        # Body is decoded while streaming, so the length only holds if unencoded
+        if 'Content-Length' in response.headers and 'Content-Encoding' not in response.headers:
+            headers['Content-Length'] = response.headers['Content-Length']
+        
+        def generate():
+            try:
+                yield from response.iter_content(chunk_size=_PROXY_CHUNK_SIZE)
+            finally:
+                response.close()
+        
+        # Stream the image through instead of buffering the whole body
         return Response(
-            response.content,
+            stream_with_context(generate()),
             mimetype=content_type,
-            headers={
-                'Cache-Control': 'public, max-age=86400',  # Cache for 1 day
-                'Access-Control-Allow-Origin': '*'
-            }
+            headers=headers,
+            direct_passthrough=True
         )
     except Exception as e:
-        logger.error(f"Image proxy error: {e}")
+        logger.error("Image proxy error: %s", e)
         return jsonify({'error': 'Failed to proxy image'}), 500
@@ -7,9 +7,17 @@ Handles infrastructure issue reporting endpoints:
 - Check for duplicates
 """
 
-import base64
+import binascii
+import hashlib
 import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from flask import Blueprint, request, jsonify, render_template, current_app
+from itsdangerous import BadData, URLSafeTimedSerializer
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from services.firestore_service import get_firestore_service
 from services.storage_service import get_storage_service
@@ -19,19 +27,179 @@ logger = logging.getLogger(__name__)
 
 report_bp = Blueprint('report', __name__)
 
+# Upload filenames for the image types a data URL header can name; anything else is stored as JPEG
+_DATA_URL_FILENAMES = {
+    'image/jpeg': 'upload.jpg',
+    'image/png': 'upload.png',
+    'image/gif': 'upload.gif',
+    'image/webp': 'upload.webp'
+}
+
+# Clients may reuse GET responses briefly, then revalidate with If-None-Match
+_CACHE_CONTROL = 'private, max-age=30'
+
+# Landing pages only vary by the Maps API key, so they are rendered once and reused
+_PAGE_CACHE_CONTROL = 'public, max-age=300'
+_rendered_pages = {}
+
+# Reports this close with an open status are flagged as potential duplicates
+_DUPLICATE_RADIUS_METERS = 15.0
+_DUPLICATE_STATUSES = ['new', 'verified']
+_DUPLICATE_FIELDS = ['id', 'issue_type', 'status']
+
+# A duplicate check run by /api/analyze is reused on submission for this many seconds
+_PREFLIGHT_MAX_AGE = 300
+
+# Largest radius the nearby endpoint searches, in meters
+_NEARBY_MAX_RADIUS_METERS = 5000.0
+
+# Pool for running the independent upload, analysis and duplicate check concurrently;
+# sized so every server thread can have its I/O in flight at once
+_EXEC = ThreadPoolExecutor(max_workers=int(os.environ.get('GUNICORN_THREADS', 32)) * 3,
+                           thread_name_prefix='report')
+
+
+def _decode_image_data(image_data: str) -> tuple:
+    """
+    Decode base64 image data, with or without a data URL prefix.
+    
+    Args:
+        image_data: Base64-encoded image data (e.g. data:image/png;base64,iVBOR...)
+    
+    Returns:
+        Tuple of (image_bytes, mime_type)
+    """
+    # Only the first bytes can hold a data URL prefix; raw base64 has no comma
+    comma = image_data.find(',', 0, 128)
+    header, payload = (image_data[:comma], image_data[comma + 1:]) if comma != -1 else ('', image_data)
+    mime_type = header[5:].partition(';')[0] if header.startswith('data:') else ''
+    if mime_type not in _DATA_URL_FILENAMES:
+        mime_type = 'image/jpeg'
+    # binascii reads the str directly, where b64decode first copies it to bytes
+    return binascii.a2b_base64(payload), mime_type
+
+
+def _render_static_page(template: str):
+    """Render a page that only depends on the Maps API key, caching the HTML."""
+    maps_api_key = current_app.config.get('GOOGLE_MAPS_API_KEY', '')
+    key = (template, maps_api_key)
+    html = _rendered_pages.get(key)
+    if html is None or current_app.templates_auto_reload:
+        html = _rendered_pages[key] = render_template(template, maps_api_key=maps_api_key)
+    response = current_app.response_class(html, mimetype='text/html')
+    response.headers['Cache-Control'] = _PAGE_CACHE_CONTROL
+    return response
+
+
+def _sniff_image_type(data: bytes) -> str:
+    """Guess an image's MIME type from its leading bytes, defaulting to JPEG."""
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'GIF8'):
+        return 'image/gif'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/jpeg'
+
+
+def _is_raw_image_request() -> bool:
+    """Whether the request body is the image itself rather than JSON or a form."""
+    return request.mimetype == 'application/octet-stream' or request.mimetype.startswith('image/')
+
+
+def _duplicate_warning(nearby_reports: list) -> Optional[dict]:
+    """Build the duplicate warning for the closest nearby report, if any."""
+    if not nearby_reports:
+        return None
+    closest = nearby_reports[0]
+    return {
+        'message': f'Similar report found {closest["distance"]:.1f}m away',
+        'existing_report': {
+            'id': closest.get('id'),
+            'issue_type': closest.get('issue_type'),
+            'status': closest.get('status'),
+            'distance': closest['distance']
+        }
+    }
+
+
+def _find_duplicates(firestore, latitude: float, longitude: float) -> list:
+    """Find open reports close enough to count as duplicates, nearest first."""
+    return firestore.find_nearby_reports(
+        latitude, longitude,
+        radius_meters=_DUPLICATE_RADIUS_METERS,
+        status_filter=_DUPLICATE_STATUSES,
+        fields=_DUPLICATE_FIELDS
+    )
+
+
+def _preflight_serializer() -> URLSafeTimedSerializer:
+    """Serializer signing duplicate check results with the app's secret key."""
+    return URLSafeTimedSerializer(current_app.secret_key, salt='duplicate-preflight')
+
+
+def _sign_preflight(latitude: float, longitude: float, nearby_reports: list) -> str:
+    """
+    Sign the result of a duplicate check so submission can reuse it.
+    
+    Args:
+        latitude: Latitude the check ran for
+        longitude: Longitude the check ran for
+        nearby_reports: Nearby reports with distance, nearest first
+    
+    Returns:
+        Token for the create_report duplicate_check field
+    """
+    closest = None
+    if nearby_reports:
+        closest = {field: nearby_reports[0].get(field) for field in _DUPLICATE_FIELDS}
+        closest['distance'] = nearby_reports[0]['distance']
+    return _preflight_serializer().dumps({'lat': latitude, 'lng': longitude, 'closest': closest})
+
+
+def _preflight_duplicates(token, latitude: float, longitude: float) -> Optional[list]:
+    """
+    Read back a duplicate check signed by _sign_preflight.
+    
+    Args:
+        token: duplicate_check value from the client
+        latitude: Latitude of the new report
+        longitude: Longitude of the new report
+    
+    Returns:
+        The closest duplicate as a one-item list, an empty list if the check found
+        none, or None if the token is invalid, expired or for another location
+    """
+    if not isinstance(token, str) or not token:
+        return None
+    try:
+        result = _preflight_serializer().loads(token, max_age=_PREFLIGHT_MAX_AGE)
+    except BadData:
+        logger.warning("Ignoring invalid or expired duplicate check token")
+        return None
+    if result.get('lat') != latitude or result.get('lng') != longitude:
+        return None
+    return [result['closest']] if result.get('closest') else []
+
+
+def _not_modified(etag: str):
+    """Build an empty 304 response for a matching ETag."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = _CACHE_CONTROL
+    return response
+
 
 @report_bp.route('/')
 def index():
     """Render the main landing page."""
-    return render_template('index.html', 
-                          maps_api_key=current_app.config.get('GOOGLE_MAPS_API_KEY', ''))
+    return _render_static_page('index.html')
 
 
 @report_bp.route('/report')
 def report_page():
     """Render the report submission page."""
-    return render_template('report.html',
-                          maps_api_key=current_app.config.get('GOOGLE_MAPS_API_KEY', ''))
+    return _render_static_page('report.html')
 
 
 @report_bp.route('/api/analyze', methods=['POST'])
@@ -40,31 +208,57 @@ def analyze_image():
     Analyze an image with AI without creating a report.
     This allows users to review and confirm the AI detection before submission.
     
-    Expects JSON with:
-    - image: Base64 image data
+    Expects one of:
+    - A raw image body (application/octet-stream or image/*), with
+      latitude/longitude in the query string
+    - Multipart form data with an image file
+    - JSON with image as base64 data (legacy clients)
+    
+    Optional latitude, longitude: Also check for nearby duplicate reports
     
     Returns:
     - AI analysis results (issue_type, description, confidence)
+    - Duplicate warning if similar report exists nearby
     """
     try:
+        firestore = get_firestore_service()
         gemini = get_gemini_service()
         
-        data = request.get_json()
-        image_data = data.get('image')
-        
-        if not image_data:
+        if _is_raw_image_request():
+            # Binary body: no base64 inflation to transfer or decode
+            params = request.args
+            image_bytes = request.get_data(cache=False)
+            mime_type = request.mimetype if request.mimetype in _DATA_URL_FILENAMES else _sniff_image_type(image_bytes)
+        elif request.files.get('image'):
+            params = request.form
+            file = request.files['image']
+            image_bytes = file.read()
+            mime_type = file.mimetype if file.mimetype in _DATA_URL_FILENAMES else _sniff_image_type(image_bytes)
+        else:
+            params = request.get_json(silent=True) or {}
+            image_data = params.get('image')
+            if not image_data:
+                return jsonify({'error': 'Image is required'}), 400
+            # Decode base64 for analysis
+            image_bytes, mime_type = _decode_image_data(image_data)
+        
+        if not image_bytes:
             return jsonify({'error': 'Image is required'}), 400
         
-        # Decode base64 for analysis
-        if ',' in image_data:
-            image_bytes = base64.b64decode(image_data.split(',')[1])
-        else:
-            image_bytes = base64.b64decode(image_data)
+        # Duplicate preflight runs alongside the analysis, so submission can skip it
+        nearby_future = None
+        if params.get('latitude') is not None and params.get('longitude') is not None:
+            try:
+                latitude = float(params['latitude'])
+                longitude = float(params['longitude'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid coordinates'}), 400
+            nearby_future = _EXEC.submit(_find_duplicates, firestore, latitude, longitude)
         
         # Analyze image with Gemini AI
-        analysis = gemini.analyze_image(image_bytes)
+        analysis = gemini.analyze_image(image_bytes, mime_type)
         
-        return jsonify({
+        response = {
             'success': True,
             'analysis': {
                 'issue_type': analysis.get('issue_type', 'other'),
@@ -72,10 +266,22 @@ def analyze_image():
                 'confidence': analysis.get('confidence', 0),
                 'ai_analyzed': analysis.get('ai_analyzed', False)
             }
-        })
+        }
+        
+        if nearby_future:
+            nearby_reports = nearby_future.result()
+            duplicate_warning = _duplicate_warning(nearby_reports)
+            if duplicate_warning:
+                response['duplicate_warning'] = duplicate_warning
+            # Lets the submission for this location skip its own duplicate query
+            response['duplicate_check'] = _sign_preflight(latitude, longitude, nearby_reports)
+        
+        return jsonify(response)
     
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Image too large'}), 413
     except Exception as e:
-        logger.error(f"Failed to analyze image: {e}")
+        logger.error("Failed to analyze image: %s", e)
         return jsonify({'error': 'Failed to analyze image'}), 500
 
 
@@ -84,12 +290,17 @@ def create_report():
     """
     Create a new infrastructure report.
     
-    Expects JSON or multipart form data with:
+    Expects JSON or multipart form data, or a raw image body
+    (application/octet-stream or image/*) with the other fields in the
+    query string:
     - image: Base64 image data or file
     - latitude: float
     - longitude: float
     - description (optional): string
     - issue_type (optional): User-confirmed issue type (overrides AI detection)
+    - force (optional): true to reuse the duplicate check from /api/analyze
+    - duplicate_check (optional): Token returned by /api/analyze; with force
+      and the same location, its result replaces the nearby query
     
     Returns:
     - Report data with AI analysis
@@ -100,29 +311,38 @@ def create_report():
         storage = get_storage_service()
         gemini = get_gemini_service()
         
-        # Handle both JSON and form data
-        if request.is_json:
-            data = request.get_json()
-            image_data = data.get('image')
-            latitude = float(data.get('latitude', 0))
-            longitude = float(data.get('longitude', 0))
-            user_description = data.get('description', '')
-            user_issue_type = data.get('issue_type')  # User-confirmed issue type
+        image_filename = 'upload.jpg'
+        image_mime = 'image/jpeg'
+        
+        # Handle raw image bodies, JSON and form data
+        if _is_raw_image_request():
+            # Binary body with the other fields in the query string
+            params = request.args
+            image_data = request.get_data(cache=False)
+            image_mime = request.mimetype if request.mimetype in _DATA_URL_FILENAMES else _sniff_image_type(image_data)
+            image_filename = _DATA_URL_FILENAMES[image_mime]
+        elif request.is_json:
+            params = request.get_json()
+            image_data = params.get('image')
         else:
             # Form data
+            params = request.form
             image_data = None
             if 'image' in request.files:
                 file = request.files['image']
                 if file.filename:
-                    image_data = file.read()
+                    # Werkzeug spools large uploads to disk; keep the stream rather than reading it
+                    image_data = file.stream
                     image_filename = file.filename
+                    if file.mimetype in _DATA_URL_FILENAMES:
+                        image_mime = file.mimetype
             elif 'image' in request.form:
                 image_data = request.form.get('image')
-            
-            latitude = float(request.form.get('latitude', 0))
-            longitude = float(request.form.get('longitude', 0))
-            user_description = request.form.get('description', '')
-            user_issue_type = request.form.get('issue_type')
+        
+        latitude = float(params.get('latitude', 0))
+        longitude = float(params.get('longitude', 0))
+        user_description = params.get('description', '')
+        user_issue_type = params.get('issue_type')  # User-confirmed issue type
         
         # Validate required fields
         if not image_data:
@@ -131,52 +351,48 @@ def create_report():
         if latitude == 0 and longitude == 0:
             return jsonify({'error': 'Location is required'}), 400
         
-        # Check for nearby duplicate reports (within 15 meters)
-        nearby_reports = firestore.find_nearby_reports(
-            latitude, longitude,
-            radius_meters=15.0,
-            status_filter=['new', 'verified']
-        )
-        
-        duplicate_warning = None
-        potential_duplicate_id = None
-        
-        if nearby_reports:
-            # Found nearby reports - potential duplicate
-            closest = nearby_reports[0]
-            duplicate_warning = {
-                'message': f'Similar report found {closest["distance"]:.1f}m away',
-                'existing_report': {
-                    'id': closest.get('id'),
-                    'issue_type': closest.get('issue_type'),
-                    'status': closest.get('status'),
-                    'distance': closest['distance']
-                }
-            }
-            potential_duplicate_id = closest.get('id')
-        
-        # Upload image to storage
-        if isinstance(image_data, bytes):
-            # Binary data from file upload
-            filename = image_filename if 'image_filename' in dir() else 'upload.jpg'
-            success, image_url = storage.upload_image(image_data, filename)
-        else:
-            # Base64 data
-            success, image_url = storage.upload_from_base64(image_data)
-            # Decode for AI analysis
-            if ',' in image_data:
-                image_data = base64.b64decode(image_data.split(',')[1])
-            else:
-                image_data = base64.b64decode(image_data)
-        
+        # Clients that already ran the duplicate preflight on /api/analyze for this
+        # location pass its signed result instead of paying for the query again
+        force = str(params.get('force', request.args.get('force', ''))).lower() == 'true'
+        preflight = _preflight_duplicates(params.get('duplicate_check'), latitude, longitude) if force else None
+        
+        if isinstance(image_data, str):
+            # Base64 data, decoded once and shared by the upload and the analysis
+            try:
+                image_data, image_mime = _decode_image_data(image_data)
+            except ValueError as e:
+                return jsonify({'error': f'Invalid image data: {e}'}), 400
+            image_filename = _DATA_URL_FILENAMES[image_mime]
+        
+        # Reject bad uploads before paying for the analysis and duplicate query
+        upload_error = storage.validate_upload(image_data, image_filename)
+        if upload_error:
+            return jsonify({'error': upload_error}), 400
+        
+        # Gemini takes the image inline, so only read a file into memory when
+        # the model will be called; otherwise stream it to storage
+        if gemini.enabled and not isinstance(image_data, bytes):
+            image_data = image_data.read()
+        
+        # Duplicate check, upload and AI analysis are independent I/O, so run them together
+        nearby_future = None
+        if preflight is None:
+            nearby_future = _EXEC.submit(_find_duplicates, firestore, latitude, longitude)
+        upload_future = _EXEC.submit(storage.upload_image, image_data, image_filename, image_mime)
+        analysis_future = _EXEC.submit(gemini.analyze_image, image_data, image_mime)
+        
+        success, image_url = upload_future.result()
         if not success:
+            # Drop work that hasn't started yet; the report won't be created
+            analysis_future.cancel()
+            if nearby_future:
+                nearby_future.cancel()
             return jsonify({'error': image_url}), 400
         
-        # Analyze image with Gemini AI
-        if isinstance(image_data, bytes):
-            analysis = gemini.analyze_image(image_data)
-        else:
-            analysis = gemini.analyze_image_from_base64(image_data)
+        analysis = analysis_future.result()
+        
+        duplicate_warning = _duplicate_warning(nearby_future.result() if nearby_future else preflight)
+        potential_duplicate_id = duplicate_warning['existing_report']['id'] if duplicate_warning else None
         
         # Use user-confirmed issue type if provided, otherwise use AI detection
         final_issue_type = user_issue_type if user_issue_type else analysis.get('issue_type', 'other')
@@ -221,14 +437,16 @@ def create_report():
         if duplicate_warning:
             response['duplicate_warning'] = duplicate_warning
         
-        logger.info(f"Created report {report_id}: {report_data['issue_type']} ({report_data['severity']}) - User confirmed: {user_confirmed}")
+        logger.info("Created report %s: %s (%s) - User confirmed: %s", report_id, report_data['issue_type'], report_data['severity'], user_confirmed)
         return jsonify(response), 201
     
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Image too large'}), 413
     except ValueError as e:
-        logger.error(f"Validation error: {e}")
+        logger.error("Validation error: %s", e)
         return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f"Failed to create report: {e}")
+        logger.error("Failed to create report: %s", e)
         return jsonify({'error': 'Failed to create report'}), 500
 
 
@@ -251,28 +469,38 @@ def get_reports():
         severity = request.args.get('severity')
         limit = int(request.args.get('limit', 100))
         
+        filters = f"{status}|{issue_type}|{severity}|{limit}"
+        version_future = None
+        if request.if_none_match:
+            # Check the cheap freshness query before running the full one
+            version = firestore.get_reports_version(status, issue_type, severity)
+            etag = hashlib.md5(f"{filters}|{version}".encode()).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                return _not_modified(etag)
+        else:
+            # Nothing to revalidate, so fetch the version alongside the page
+            version_future = _EXEC.submit(firestore.get_reports_version, status, issue_type, severity)
+        
         reports = firestore.get_all_reports(
             status=status,
             issue_type=issue_type,
             severity=severity,
             limit=limit
         )
+        if version_future:
+            etag = hashlib.md5(f"{filters}|{version_future.result()}".encode()).hexdigest()
         
-        # Convert datetime objects to strings for JSON serialization
-        for report in reports:
-            if 'created_at' in report:
-                report['created_at'] = report['created_at'].isoformat() if hasattr(report['created_at'], 'isoformat') else str(report['created_at'])
-            if 'updated_at' in report:
-                report['updated_at'] = report['updated_at'].isoformat() if hasattr(report['updated_at'], 'isoformat') else str(report['updated_at'])
-        
-        return jsonify({
+        response = jsonify({
             'success': True,
             'reports': reports,
             'count': len(reports)
         })
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = _CACHE_CONTROL
+        return response
     
     except Exception as e:
-        logger.error(f"Failed to get reports: {e}")
+        logger.error("Failed to get reports: %s", e)
         return jsonify({'error': 'Failed to get reports'}), 500
 
 
@@ -286,19 +514,23 @@ def get_report(report_id):
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        # Convert datetime objects
-        if 'created_at' in report:
-            report['created_at'] = report['created_at'].isoformat() if hasattr(report['created_at'], 'isoformat') else str(report['created_at'])
-        if 'updated_at' in report:
-            report['updated_at'] = report['updated_at'].isoformat() if hasattr(report['updated_at'], 'isoformat') else str(report['updated_at'])
+        # Reports change only through updates, which bump updated_at
+        updated_at = report.get('updated_at')
+        etag = f"{report_id}-{updated_at.isoformat()}" if hasattr(updated_at, 'isoformat') else None
+        if etag and request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'report': report
         })
+        if etag:
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = _CACHE_CONTROL
+        return response
     
     except Exception as e:
-        logger.error(f"Failed to get report {report_id}: {e}")
+        logger.error("Failed to get report %s: %s", report_id, e)
         return jsonify({'error': 'Failed to get report'}), 500
 
 
@@ -310,26 +542,22 @@ def get_nearby_reports():
     Query parameters:
     - lat: Latitude (required)
     - lng: Longitude (required)
-    - radius: Search radius in meters (default 50)
+    - radius: Search radius in meters (default 50, at most 5000)
     """
     try:
         lat = float(request.args.get('lat', 0))
         lng = float(request.args.get('lng', 0))
         radius = float(request.args.get('radius', 50))
         
+        if not (math.isfinite(lat) and math.isfinite(lng) and math.isfinite(radius)):
+            return jsonify({'error': 'Invalid coordinates'}), 400
         if lat == 0 and lng == 0:
             return jsonify({'error': 'Location is required'}), 400
+        radius = min(max(radius, 0.0), _NEARBY_MAX_RADIUS_METERS)
         
         firestore = get_firestore_service()
         reports = firestore.find_nearby_reports(lat, lng, radius)
         
-        # Convert datetime objects
-        for report in reports:
-            if 'created_at' in report:
-                report['created_at'] = report['created_at'].isoformat() if hasattr(report['created_at'], 'isoformat') else str(report['created_at'])
-            if 'updated_at' in report:
-                report['updated_at'] = report['updated_at'].isoformat() if hasattr(report['updated_at'], 'isoformat') else str(report['updated_at'])
-        
         return jsonify({
             'success': True,
             'reports': reports,
@@ -341,5 +569,5 @@ def get_nearby_reports():
     except ValueError as e:
         return jsonify({'error': 'Invalid coordinates'}), 400
     except Exception as e:
-        logger.error(f"Failed to get nearby reports: {e}")
+        logger.error("Failed to get nearby reports: %s", e)
         return jsonify({'error': 'Failed to get nearby reports'}), 500
@@ -7,7 +7,7 @@ Uses Firebase Admin SDK for server-side token verification.
 
 import os
 import logging
-from functools import wraps
+from functools import lru_cache, wraps
 from flask import session, redirect, url_for, request, current_app
 
 # Firebase Admin SDK
@@ -53,7 +53,7 @@ class AuthService:
                 self.enabled = True
                 logger.info("Firebase Admin SDK initialized successfully")
             except Exception as e:
-                logger.warning(f"Failed to initialize Firebase: {e}")
+                logger.warning("Failed to initialize Firebase: %s", e)
                 self.enabled = False
     
     def verify_id_token(self, id_token: str) -> dict:
@@ -74,7 +74,7 @@ class AuthService:
             decoded_token = auth.verify_id_token(id_token)
             return decoded_token
         except Exception as e:
-            logger.error(f"Token verification failed: {e}")
+            logger.error("Token verification failed: %s", e)
             return {}
     
     def is_admin_email(self, email: str) -> bool:
@@ -106,29 +106,33 @@ class AuthService:
         # return email.lower() in admin_list
 
 
-# Singleton instance
-_auth_service = None
-
-
+@lru_cache(maxsize=1)
 def get_auth_service() -> AuthService:
     """Get or create the Auth service singleton."""
-    global _auth_service
-    if _auth_service is None:
-        _auth_service = AuthService()
-    return _auth_service
+    return AuthService()
+
+
+def auth_disabled() -> bool:
+    """Whether admin login is turned off (AUTH_DISABLED=1, the default)."""
+    return os.environ.get('AUTH_DISABLED', '1') == '1'
 
 
 def login_required(f):
     """
     Decorator to require authentication for admin routes.
     Checks for a valid session with user information.
+    
+    Auth is disabled for the Hackathon MVP (AUTH_DISABLED=1, the default),
+    in which case the view is returned unwrapped.
     """
+    if auth_disabled():
+        return f
+    
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Disabled for Hackathon MVP - Allow everyone access
-        # if not session.get('admin_logged_in'):
-        #     # Store the original URL to redirect back after login
-        #     session['next_url'] = request.url
-        #     return redirect(url_for('auth.login'))
+        if not session.get('admin_logged_in'):
+            # Store the original URL to redirect back after login
+            session['next_url'] = request.url
+            return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
     return decorated_function
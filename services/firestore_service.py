@@ -24,10 +24,17 @@ Document fields:
 
 import os
 import logging
-from datetime import datetime
-from typing import Optional
+import json
+import base64
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
 import math
 
+import numpy as np
+
 # Google Cloud Firestore
 try:
     from google.cloud import firestore
@@ -48,59 +55,181 @@ try:
 except ImportError:
     FIREBASE_ADMIN_AVAILABLE = False
 
+# Numba (optional) compiles the scalar geo helpers to native code
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
 # Geohash characters for encoding
 GEOHASH_CHARS = '0123456789bcdefghjkmnpqrstuvwxyz'
+_GEOHASH_VALUES = {char: value for value, char in enumerate(GEOHASH_CHARS)}
+
+# Every pair of geohash characters, indexed by its 10 bits
+_GEOHASH_PAIRS = [first + second for first in GEOHASH_CHARS for second in GEOHASH_CHARS]
+
+# Precision of the geohash stored on each report
+GEOHASH_PRECISION = 7
+
+# Each axis is quantized to 30 bits, enough for 12 geohash characters
+GEOHASH_MAX_PRECISION = 12
+_AXIS_MAX = (1 << 30) - 1
+_LAT_SCALE = (1 << 30) / 180.0
+_LON_SCALE = (1 << 30) / 360.0
+
+# Query the integer geohash instead of the string one; enable once every
+# report has geohash_int (see FirestoreService.backfill_geohash_int)
+GEOHASH_INT_QUERIES = os.environ.get('GEOHASH_INT_QUERIES', '0') == '1'
+
+# Precision of the geohash buckets indexing the mock store (~4.9km cells)
+MOCK_INDEX_PRECISION = 5
+
+# Categorical fields as int8 codes for the mock columns; -1 marks any other value
+_STATUS_CODES = {'new': 0, 'verified': 1, 'resolved': 2}
+_ISSUE_TYPE_CODES = {'pothole': 0, 'broken_light': 1, 'garbage': 2, 'waterlogging': 3, 'other': 4, 'none': 5}
+_SEVERITY_CODES = {'low': 0, 'medium': 1, 'high': 2}
+
+# Heatmap weight per severity code; unknown severities weigh as low
+_WEIGHT_LUT = np.array([0.3, 0.6, 1.0])
 
+# Fields the heatmap needs, so queries can skip descriptions and image URLs
+_HEATMAP_FIELDS = ['latitude', 'longitude', 'severity', 'status']
 
-def encode_geohash(lat: float, lon: float, precision: int = 7) -> str:
+# Statistics buckets: group -> (field, default value, counted values)
+STATS_BUCKETS = {
+    'by_status': ('status', 'new', ('new', 'verified', 'resolved')),
+    'by_type': ('issue_type', 'other', ('pothole', 'broken_light', 'garbage', 'waterlogging', 'other')),
+    'by_severity': ('severity', 'medium', ('high', 'medium', 'low'))
+}
+
+# Sorts reports without a creation time after all others
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+# Shared pool for fanning out independent Firestore queries
+_EXEC = ThreadPoolExecutor(max_workers=8, thread_name_prefix='firestore')
+
+
+def _spread_bits(x: int) -> int:
+    """Spread the low 32 bits of x onto the even bit positions of a 64-bit integer."""
+    x = (x | (x << 16)) & 0x0000FFFF0000FFFF
+    x = (x | (x << 8)) & 0x00FF00FF00FF00FF
+    x = (x | (x << 4)) & 0x0F0F0F0F0F0F0F0F
+    x = (x | (x << 2)) & 0x3333333333333333
+    x = (x | (x << 1)) & 0x5555555555555555
+    return x
+
+
+def _interleave_coordinates(lat: float, lon: float) -> int:
+    """Quantize both axes to 30 bits and interleave them, longitude first."""
+    lat_bits = min(max(int((lat + 90.0) * _LAT_SCALE), 0), _AXIS_MAX)
+    lon_bits = min(max(int((lon + 180.0) * _LON_SCALE), 0), _AXIS_MAX)
+    return (_spread_bits(lon_bits) << 1) | _spread_bits(lat_bits)
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
     """
     Encode latitude and longitude into a geohash string.
     Used for efficient geo-proximity queries in Firestore.
+    Results are cached, since devices and covering cells often repeat coordinates.
+    
+    Coordinates are rounded to 7 decimals (~1cm) first, so values that differ
+    only by float noise share a cache entry. That is finer than the smallest
+    cell, so only points within ~5mm of a cell edge can move to the neighbour.
     
     Args:
         lat: Latitude (-90 to 90)
         lon: Longitude (-180 to 180)
-        precision: Number of characters in geohash (default 7, ~150m precision)
+        precision: Number of characters in geohash (default 7, ~150m precision; max 12)
     
     Returns:
         Geohash string
     """
-    lat_range = [-90.0, 90.0]
-    lon_range = [-180.0, 180.0]
-    geohash = []
-    bits = [16, 8, 4, 2, 1]
-    bit = 0
-    ch = 0
-    is_lon = True
-    
-    while len(geohash) < precision:
-        if is_lon:
-            mid = (lon_range[0] + lon_range[1]) / 2
-            if lon >= mid:
-                ch |= bits[bit]
-                lon_range[0] = mid
-            else:
-                lon_range[1] = mid
-        else:
-            mid = (lat_range[0] + lat_range[1]) / 2
-            if lat >= mid:
-                ch |= bits[bit]
-                lat_range[0] = mid
-            else:
-                lat_range[1] = mid
-        
-        is_lon = not is_lon
-        bit += 1
-        
-        if bit == 5:
-            geohash.append(GEOHASH_CHARS[ch])
-            bit = 0
-            ch = 0
+    return _encode_geohash_cached(round(lat, 7), round(lon, 7), precision)
+
+
+@lru_cache(maxsize=8192)
+def _encode_geohash_cached(lat: float, lon: float, precision: int) -> str:
+    """
+    Encode rounded coordinates for encode_geohash.
+    
+    Quantizes each axis to a 30-bit integer and interleaves the two
+    with bit masks, instead of bisecting the ranges one bit at a time,
+    then maps the 60 bits to characters two at a time.
+    """
+    if precision > GEOHASH_MAX_PRECISION:
+        raise ValueError(f"Geohash precision must be at most {GEOHASH_MAX_PRECISION}")
+    
+    bits = _interleave_coordinates(lat, lon)
+    geohash = (_GEOHASH_PAIRS[bits >> 50] + _GEOHASH_PAIRS[(bits >> 40) & 1023] +
+               _GEOHASH_PAIRS[(bits >> 30) & 1023] + _GEOHASH_PAIRS[(bits >> 20) & 1023] +
+               _GEOHASH_PAIRS[(bits >> 10) & 1023] + _GEOHASH_PAIRS[bits & 1023])
+    return geohash[:precision]
+
+
+def encode_geohash_int(lat: float, lon: float) -> int:
+    """
+    Encode latitude and longitude as a 60-bit integer geohash.
+    Sorts the same as the string form, and every string prefix maps
+    to a contiguous integer range (see geohash_int_range).
+    
+    Args:
+        lat: Latitude (-90 to 90)
+        lon: Longitude (-180 to 180)
+    
+    Returns:
+        Interleaved coordinate bits, longitude first
+    """
+    return _interleave_coordinates(lat, lon)
+
+
+def geohash_int_range(prefix: str) -> Tuple[int, int]:
+    """
+    Find the integer geohash range covered by a geohash prefix.
     
-    return ''.join(geohash)
+    Args:
+        prefix: Geohash string prefix
+    
+    Returns:
+        (start, end) with start inclusive and end exclusive
+    """
+    value = 0
+    for char in prefix:
+        value = (value << 5) | _GEOHASH_VALUES[char]
+    shift = 5 * (GEOHASH_MAX_PRECISION - len(prefix))
+    return value << shift, (value + 1) << shift
+
+
+def geohash_neighbours(lat: float, lon: float, precision: int) -> set:
+    """
+    Find the geohash cell containing a point and its 8 neighbours.
+    
+    Args:
+        lat: Latitude (-90 to 90)
+        lon: Longitude (-180 to 180)
+        precision: Number of characters in each geohash
+    
+    Returns:
+        Set of up to 9 geohash strings (fewer at the poles)
+    """
+    lat_bits = 5 * precision // 2
+    cell_height = 180.0 / (1 << lat_bits)
+    cell_width = 360.0 / (1 << (5 * precision - lat_bits))
+    
+    # Center of the cell containing the point
+    center_lat = -90 + ((lat + 90) // cell_height + 0.5) * cell_height
+    center_lon = -180 + ((lon + 180) // cell_width + 0.5) * cell_width
+    
+    cells = set()
+    for d_lat in (-cell_height, 0.0, cell_height):
+        for d_lon in (-cell_width, 0.0, cell_width):
+            # Neighbours wrap around the antimeridian; encoding clamps at the poles
+            neighbour_lon = (center_lon + d_lon + 180) % 360 - 180
+            cells.add(encode_geohash(center_lat + d_lat, neighbour_lon, precision))
+    return cells
 
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -114,6 +243,11 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     Returns:
         Distance in meters
     """
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in meters; compiled with Numba when available."""
     R = 6371000  # Earth's radius in meters
     
     lat1_rad = math.radians(lat1)
@@ -128,6 +262,282 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return R * c
 
 
+def _jit(func):
+    """Compile a scalar helper with Numba, releasing the GIL while it runs."""
+    try:
+        return njit(cache=True, fastmath=True, nogil=True)(func)
+    except RuntimeError:
+        # No writable cache location (e.g. read-only deploys); compile per process
+        return njit(fastmath=True, nogil=True)(func)
+
+
+if NUMBA_AVAILABLE:
+    _spread_bits = _jit(_spread_bits)
+    _interleave_coordinates = _jit(_interleave_coordinates)
+    _haversine = _jit(_haversine)
+
+
+def haversine_distances(lat: float, lon: float,
+                        lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Haversine distance from one point to many.
+    
+    Args:
+        lat, lon: Origin coordinates
+        lats, lons: Arrays of target coordinates
+    
+    Returns:
+        Array of distances in meters
+    """
+    R = 6371000  # Earth's radius in meters
+    
+    lat_rad = math.radians(lat)
+    lats_rad = np.radians(lats)
+    delta_lat = lats_rad - lat_rad
+    delta_lon = np.radians(lons - lon)
+    
+    a = (np.sin(delta_lat / 2) ** 2 +
+         math.cos(lat_rad) * np.cos(lats_rad) * np.sin(delta_lon / 2) ** 2)
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_distances_rad(lat: float, lon: float, lats_rad: np.ndarray,
+                            lons_rad: np.ndarray, cos_lats: np.ndarray) -> np.ndarray:
+    """
+    Vectorized Haversine distance from one point to many, with the
+    targets' radians and latitude cosines precomputed. Computes in the
+    precision of the target arrays.
+    
+    Args:
+        lat, lon: Origin coordinates in degrees
+        lats_rad, lons_rad: Arrays of target coordinates in radians
+        cos_lats: Cosines of the target latitudes
+    
+    Returns:
+        Array of distances in meters
+    """
+    R = 6371000  # Earth's radius in meters
+    
+    # Python float scalars adopt the arrays' dtype, keeping float32 inputs in float32
+    lat_rad = math.radians(lat)
+    lon_rad = math.radians(lon)
+    
+    a = (np.sin((lats_rad - lat_rad) / 2) ** 2 +
+         math.cos(lat_rad) * cos_lats * np.sin((lons_rad - lon_rad) / 2) ** 2)
+    return 2 * R * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def geohash_cells_for_bounds(north: float, south: float, east: float, west: float,
+                             max_cells: int = 9) -> Optional[list]:
+    """
+    Find the geohash cells covering a bounding box.
+    Picks the finest precision (up to the stored precision) at which
+    at most max_cells cells cover the box.
+    
+    Args:
+        north, south, east, west: Bounding box edges in degrees
+        max_cells: Maximum number of cells to return
+    
+    Returns:
+        List of geohash prefixes, or None if the box is too large for
+        max_cells cells or crosses the antimeridian
+    """
+    if south > north or west > east:
+        return None
+    
+    best = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        lat_bits = 5 * precision // 2
+        lon_bits = 5 * precision - lat_bits
+        cell_height = 180.0 / (1 << lat_bits)
+        cell_width = 360.0 / (1 << lon_bits)
+        
+        # Grid cell indices of the box edges, clamped to the valid range
+        rows = range(max(0, int((south + 90) // cell_height)),
+                     min((1 << lat_bits) - 1, int((north + 90) // cell_height)) + 1)
+        cols = range(max(0, int((west + 180) // cell_width)),
+                     min((1 << lon_bits) - 1, int((east + 180) // cell_width)) + 1)
+        
+        if len(rows) * len(cols) > max_cells:
+            break
+        best = (precision, cell_height, cell_width, rows, cols)
+    
+    if best is None:
+        return None
+    
+    # Encode the center of each covering cell
+    precision, cell_height, cell_width, rows, cols = best
+    return [
+        encode_geohash(-90 + (row + 0.5) * cell_height, -180 + (col + 0.5) * cell_width, precision)
+        for row in rows
+        for col in cols
+    ]
+
+
+def geohash_cells_for_radius(lat: float, lon: float, radius_meters: float) -> list:
+    """
+    Find the geohash cells covering a search circle's bounding box.
+    A box crossing the antimeridian is split into one covering per side.
+    
+    Args:
+        lat: Latitude of the center
+        lon: Longitude of the center
+        radius_meters: Search radius in meters
+    
+    Returns:
+        List of geohash prefixes; the center's precision-5 cell (~5km) if the
+        box is too large to cover
+    """
+    lat_delta = radius_meters / 111320.0
+    lon_delta = lat_delta / max(math.cos(math.radians(lat)), 1e-6)
+    fallback = [encode_geohash(lat, lon, precision=5)]
+    if not math.isfinite(lat_delta) or lat_delta < 0:
+        return fallback
+    
+    north, south = min(lat + lat_delta, 90.0), max(lat - lat_delta, -90.0)
+    if lon_delta >= 180:
+        spans = [(-180.0, 180.0)]
+    elif lon - lon_delta < -180:
+        spans = [(lon - lon_delta + 360, 180.0), (-180.0, lon + lon_delta)]
+    elif lon + lon_delta > 180:
+        spans = [(lon - lon_delta, 180.0), (-180.0, lon + lon_delta - 360)]
+    else:
+        spans = [(lon - lon_delta, lon + lon_delta)]
+    
+    cells = []
+    for west, east in spans:
+        covering = geohash_cells_for_bounds(north, south, east, west)
+        if covering is None:
+            return fallback
+        cells.extend(covering)
+    return cells
+
+
+def encode_cursor(report: dict) -> Optional[str]:
+    """
+    Encode a pagination cursor from the last report of a page.
+    
+    Args:
+        report: Report dict with created_at and id
+    
+    Returns:
+        URL-safe cursor token, or None if the report can't be used as a cursor
+    """
+    created_at = report.get('created_at')
+    report_id = report.get('id')
+    if created_at is None or not report_id:
+        return None
+    
+    if hasattr(created_at, 'isoformat'):
+        created_at = created_at.isoformat()
+    raw = json.dumps([str(created_at), report_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a pagination cursor produced by encode_cursor.
+    
+    Args:
+        cursor: Cursor token
+    
+    Returns:
+        Tuple of (created_at, report_id)
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), str(report_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class _MockColumns:
+    """
+    Numeric and categorical fields of the mock reports as parallel NumPy arrays.
+    Rows follow insertion order; deleted rows are tombstoned and
+    compacted once they make up half of the arrays.
+    """
+    
+    _COLUMNS = ('lat', 'lon', 'lat_rad', 'lon_rad', 'cos_lat',
+                'status', 'issue_type', 'severity', 'alive')
+    
+    def __init__(self, capacity: int = 64):
+        self.ids = []  # row -> report ID, None once deleted
+        self.rows = {}  # report ID -> row
+        self.size = 0
+        self.dead = 0
+        self.lat = np.empty(capacity)
+        self.lon = np.empty(capacity)
+        # Radians and latitude cosines, so distance checks skip that trig per row.
+        # Single precision resolves about 1m, finer than GPS fixes, at half the
+        # memory traffic; the degree columns stay double for returned coordinates
+        self.lat_rad = np.empty(capacity, dtype=np.float32)
+        self.lon_rad = np.empty(capacity, dtype=np.float32)
+        self.cos_lat = np.empty(capacity, dtype=np.float32)
+        self.status = np.empty(capacity, dtype=np.int8)
+        self.issue_type = np.empty(capacity, dtype=np.int8)
+        self.severity = np.empty(capacity, dtype=np.int8)
+        self.alive = np.empty(capacity, dtype=np.bool_)
+    
+    def _resize(self, capacity: int):
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+    
+    def set(self, report: dict):
+        """Insert or overwrite the row for a report."""
+        row = self.rows.get(report['id'])
+        if row is None:
+            if self.size == len(self.lat):
+                self._resize(2 * self.size)
+            row = self.size
+            self.size += 1
+            self.ids.append(report['id'])
+            self.rows[report['id']] = row
+            self.alive[row] = True
+        lat = report.get('latitude')
+        lon = report.get('longitude')
+        # Missing coordinates are NaN, which fail every distance and bounds comparison
+        self.lat[row] = np.nan if lat is None else lat
+        self.lon[row] = np.nan if lon is None else lon
+        self.lat_rad[row] = math.radians(self.lat[row])
+        self.lon_rad[row] = math.radians(self.lon[row])
+        self.cos_lat[row] = math.cos(self.lat_rad[row])
+        self.status[row] = _STATUS_CODES.get(report.get('status'), -1)
+        self.issue_type[row] = _ISSUE_TYPE_CODES.get(report.get('issue_type'), -1)
+        self.severity[row] = _SEVERITY_CODES.get(report.get('severity'), -1)
+    
+    def remove(self, report_id: str):
+        """Tombstone a report's row."""
+        row = self.rows.pop(report_id, None)
+        if row is None:
+            return
+        self.alive[row] = False
+        self.ids[row] = None
+        self.dead += 1
+        if self.dead * 2 > self.size:
+            self._compact()
+    
+    def _compact(self):
+        live = self.live_rows()
+        for name in self._COLUMNS:
+            column = getattr(self, name)
+            column[:len(live)] = column[live]
+        self.ids = [self.ids[row] for row in live]
+        self.rows = {report_id: row for row, report_id in enumerate(self.ids)}
+        self.size = len(live)
+        self.dead = 0
+    
+    def live_rows(self) -> np.ndarray:
+        """Rows of reports that haven't been deleted, in insertion order."""
+        return np.flatnonzero(self.alive[:self.size])
+
+
 class FirestoreService:
     """Service class for Firestore operations."""
     
@@ -178,7 +588,7 @@ class FirestoreService:
                     self.enabled = True
                     logger.info("Firestore client initialized via Firebase Admin SDK")
             except Exception as e:
-                logger.warning(f"Failed to initialize Firestore via Firebase Admin: {e}")
+                logger.warning("Failed to initialize Firestore via Firebase Admin: %s", e)
         
         # Fallback to Google Cloud Firestore (uses ADC)
         if not self.enabled and FIRESTORE_AVAILABLE:
@@ -190,7 +600,7 @@ class FirestoreService:
                 self.enabled = True
                 logger.info("Firestore client initialized successfully")
             except Exception as e:
-                logger.warning(f"Failed to initialize Firestore: {e}")
+                logger.warning("Failed to initialize Firestore: %s", e)
                 self.db = None
                 self.enabled = False
         
@@ -199,19 +609,18 @@ class FirestoreService:
         
         # In-memory storage for development/testing
         self._mock_reports = {}
-    
-    def create_report(self, report_data: dict) -> str:
-        """
-        Create a new infrastructure report.
-        
-        Args:
-            report_data: Dictionary containing report information
+        # Mock report IDs bucketed by geohash prefix, for nearby lookups
+        self._geo_index = {}
+        # Numeric mock fields as columns, for vectorized scans
+        self._mock_columns = _MockColumns()
         
-        Returns:
-            Report ID
-        """
-        # Add timestamps and default values
-        now = datetime.utcnow()
+        # Compile the JIT helpers now rather than on the first request
+        if NUMBA_AVAILABLE:
+            encode_geohash(0.0, 0.0)
+            calculate_distance(0.0, 0.0, 0.0, 0.0)
+    
+    def _prepare_new_report(self, report_data: dict, now: datetime) -> dict:
+        """Add timestamps, default values and geohashes to a new report."""
         report_data['created_at'] = now
         report_data['updated_at'] = now
         report_data['status'] = report_data.get('status', 'new')
@@ -222,22 +631,93 @@ class FirestoreService:
                 report_data['latitude'],
                 report_data['longitude']
             )
+            report_data['geohash_int'] = encode_geohash_int(
+                report_data['latitude'],
+                report_data['longitude']
+            )
+        return report_data
+    
+    def _store_mock_report(self, report_data: dict) -> str:
+        """Store a prepared report in the in-memory mock store."""
+        report_id = secrets.token_urlsafe(6)
+        report_data['id'] = report_id
+        self._mock_reports[report_id] = report_data
+        self._index_mock_report(report_data)
+        self._mock_columns.set(report_data)
+        return report_id
+    
+    def create_report(self, report_data: dict) -> str:
+        """
+        Create a new infrastructure report.
+        
+        Args:
+            report_data: Dictionary containing report information
+        
+        Returns:
+            Report ID
+        """
+        self._prepare_new_report(report_data, datetime.now(timezone.utc))
         
         if self.enabled and self.db:
             doc_ref = self.db.collection('reports').document()
             report_data['id'] = doc_ref.id
             doc_ref.set(report_data)
-            logger.info(f"Created report with ID: {doc_ref.id}")
+            logger.info("Created report with ID: %s", doc_ref.id)
             return doc_ref.id
         else:
             # Mock mode for development
-            import uuid
-            report_id = str(uuid.uuid4())[:8]
-            report_data['id'] = report_id
-            self._mock_reports[report_id] = report_data
-            logger.info(f"Created mock report with ID: {report_id}")
+            report_id = self._store_mock_report(report_data)
+            logger.info("Created mock report with ID: %s", report_id)
             return report_id
     
+    def create_reports_bulk(self, reports: list) -> list:
+        """
+        Create multiple reports at once.
+        Uses a Firestore BulkWriter so writes are batched and sent in
+        parallel instead of one round-trip per document.
+        
+        Args:
+            reports: List of dictionaries containing report information
+        
+        Returns:
+            IDs of the created reports, in input order; reports that
+            failed to write are left out
+        """
+        now = datetime.now(timezone.utc)
+        for report_data in reports:
+            self._prepare_new_report(report_data, now)
+        
+        if self.enabled and self.db:
+            collection = self.db.collection('reports')
+            failed_ids = set()
+            
+            def on_write_error(failure, _writer):
+                failed_ids.add(failure.operation.reference.id)
+                return False  # Don't retry, report as failed
+            
+            report_ids = []
+            try:
+                writer = self.db.bulk_writer()
+                writer.on_write_error(on_write_error)
+                for report_data in reports:
+                    # IDs are assigned client-side, so no round-trip is needed per document
+                    doc_ref = collection.document()
+                    report_data['id'] = doc_ref.id
+                    writer.create(doc_ref, report_data)
+                    report_ids.append(doc_ref.id)
+                writer.close()
+            except Exception as e:
+                logger.error("Failed to bulk create reports: %s", e)
+                return []
+            
+            created = [report_id for report_id in report_ids if report_id not in failed_ids]
+            logger.info("Bulk created %s/%s reports", len(created), len(reports))
+            return created
+        else:
+            report_ids = [self._store_mock_report(report_data) for report_data in reports]
+            logger.info("Created %s mock reports", len(report_ids))
+            return report_ids
+    
     def get_report(self, report_id: str) -> Optional[dict]:
         """
         Get a report by ID.
@@ -260,7 +740,9 @@ class FirestoreService:
     def get_all_reports(self, status: Optional[str] = None, 
                         issue_type: Optional[str] = None,
                         severity: Optional[str] = None,
-                        limit: int = 100) -> list:
+                        limit: int = 100,
+                        start_after: Optional[str] = None,
+                        fields: Optional[list] = None) -> list:
         """
         Get all reports with optional filtering.
         
@@ -269,10 +751,17 @@ class FirestoreService:
             issue_type: Filter by issue type
             severity: Filter by severity
             limit: Maximum number of reports to return
+            start_after: Cursor from encode_cursor; returns the page after it
+            fields: Only return these fields (default: all fields)
         
         Returns:
             List of reports
+        
+        Raises:
+            ValueError: If start_after is not a valid cursor
         """
+        cursor = decode_cursor(start_after) if start_after else None
+        
         if self.enabled and self.db:
             query = self.db.collection('reports')
             
@@ -284,82 +773,312 @@ class FirestoreService:
                 query = query.where('severity', '==', severity)
             
             query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+            
+            if cursor:
+                # Order by document ID as a tie-breaker so the cursor is unique
+                created_at, report_id = cursor
+                query = query.order_by('__name__', direction=firestore.Query.DESCENDING)
+                query = query.start_after({
+                    'created_at': created_at,
+                    '__name__': self.db.collection('reports').document(report_id)
+                })
+            
             query = query.limit(limit)
+            if fields:
+                query = query.select(fields)
             
             docs = query.stream()
             return [doc.to_dict() for doc in docs]
         else:
-            # Mock mode
-            reports = list(self._mock_reports.values())
-            if status:
-                reports = [r for r in reports if r.get('status') == status]
-            if issue_type:
-                reports = [r for r in reports if r.get('issue_type') == issue_type]
-            if severity:
-                reports = [r for r in reports if r.get('severity') == severity]
-            return reports[:limit]
+            # Mock mode: filter the coded columns, then look up only the page
+            columns = self._mock_columns
+            rows = columns.live_rows()
+            if cursor:
+                _, report_id = cursor
+                if report_id in columns.rows:
+                    rows = rows[rows > columns.rows[report_id]]
+            for field, column, codes, value in (
+                ('status', columns.status, _STATUS_CODES, status),
+                ('issue_type', columns.issue_type, _ISSUE_TYPE_CODES, issue_type),
+                ('severity', columns.severity, _SEVERITY_CODES, severity),
+            ):
+                if not value:
+                    continue
+                code = codes.get(value)
+                if code is not None:
+                    rows = rows[column[rows] == code]
+                else:
+                    # Values without a code are compared on the records
+                    rows = rows[[self._mock_reports[columns.ids[row]].get(field) == value for row in rows]]
+            reports = [self._mock_reports[columns.ids[row]] for row in rows[:limit]]
+            if fields:
+                reports = [{k: r[k] for k in fields if k in r} for r in reports]
+            return reports
     
     def find_nearby_reports(self, lat: float, lon: float, 
                            radius_meters: float = 15.0,
-                           status_filter: Optional[list] = None) -> list:
+                           status_filter: Optional[list] = None,
+                           fields: Optional[list] = None) -> list:
         """
         Find reports within a given radius of a location.
-        Uses geohash prefix matching for efficient queries.
+        Queries the geohash cells covering the radius in parallel,
+        then filters the candidates by exact distance.
         
         Args:
             lat: Latitude
             lon: Longitude
             radius_meters: Search radius in meters (default 15m)
             status_filter: Optional list of statuses to include
+            fields: Only return these fields (default: all fields)
         
         Returns:
             List of nearby reports with distance
         """
-        # Get geohash prefix for the area (precision 5 = ~5km area)
-        geohash_prefix = encode_geohash(lat, lon, precision=5)
+        # IDs de-duplicate cell results; coordinates and status feed the filters below
+        if fields:
+            fields = list({*fields, 'id', 'latitude', 'longitude', 'status'})
         
         if self.enabled and self.db:
-            # Query reports with matching geohash prefix
-            query = self.db.collection('reports')
-            if FieldFilter:
-                query = query.where(filter=FieldFilter('geohash', '>=', geohash_prefix))
-                query = query.where(filter=FieldFilter('geohash', '<', geohash_prefix + '\uffff'))
-            else:
-                query = query.where('geohash', '>=', geohash_prefix)
-                query = query.where('geohash', '<', geohash_prefix + '\uffff')
+            # Cover the search circle's bounding box with up to 9 geohash cells per side
+            cells = geohash_cells_for_radius(lat, lon, radius_meters)
+            reports = self._query_geohash_cells(cells, fields=fields, statuses=status_filter)
+            # Statuses are filtered here, keeping the query on the geohash index only
             
             if status_filter:
-                # Note: Firestore doesn't support IN with range queries
-                # We'll filter in memory
-                pass
+                reports = [r for r in reports if r.get('status') in status_filter]
+            if not reports:
+                return []
             
-            docs = query.stream()
-            reports = [doc.to_dict() for doc in docs]
+            # Compute every candidate's distance in one vectorized pass
+            count = len(reports)
+            lats = np.fromiter((r.get('latitude', 0) for r in reports), dtype=np.float64, count=count)
+            lons = np.fromiter((r.get('longitude', 0) for r in reports), dtype=np.float64, count=count)
+            distances = haversine_distances(lat, lon, lats, lons)
+            within = np.flatnonzero(distances <= radius_meters)
         else:
-            # Mock mode
-            reports = list(self._mock_reports.values())
-        
-        # Filter by exact distance and status
-        nearby = []
-        for report in reports:
-            if status_filter and report.get('status') not in status_filter:
-                continue
+            # Mock mode: screen the bucketed rows in single precision straight from
+            # the columns, with a margin above its ~1.5m error, then compute exact
+            # distances and look up the reports for the few rows that pass
+            lat_delta = radius_meters / 111320.0
+            lon_delta = lat_delta / max(math.cos(math.radians(lat)), 1e-6)
+            columns = self._mock_columns
+            rows = self._mock_candidate_rows(lat, lon, lat_delta, lon_delta)
+            distances = haversine_distances_rad(lat, lon, columns.lat_rad[rows],
+                                                columns.lon_rad[rows], columns.cos_lat[rows])
+            rows = rows[distances <= radius_meters * 1.001 + 2.0]
+            distances = haversine_distances(lat, lon, columns.lat[rows], columns.lon[rows])
+            close = distances <= radius_meters
+            rows, distances = rows[close], distances[close]
+            reports = [self._mock_reports[columns.ids[row]] for row in rows]
+            within = np.arange(len(reports))
             
-            distance = calculate_distance(
-                lat, lon,
-                report.get('latitude', 0),
-                report.get('longitude', 0)
-            )
-            
-            if distance <= radius_meters:
-                report_copy = report.copy()
-                report_copy['distance'] = distance
-                nearby.append(report_copy)
+            if status_filter:
+                within = within[[r.get('status') in status_filter for r in reports]]
         
-        # Sort by distance
-        nearby.sort(key=lambda x: x['distance'])
+        # Nearest first
+        within = within[np.argsort(distances[within], kind='stable')]
+        
+        nearby = []
+        for i in within:
+            if fields:
+                report_copy = {k: reports[i][k] for k in fields if k in reports[i]}
+            else:
+                report_copy = reports[i].copy()
+            report_copy['distance'] = float(distances[i])
+            nearby.append(report_copy)
         return nearby
     
+    def _index_mock_report(self, report: dict) -> None:
+        """Add a mock report to its geohash bucket."""
+        geohash = report.get('geohash')
+        if geohash:
+            self._geo_index.setdefault(geohash[:MOCK_INDEX_PRECISION], set()).add(report['id'])
+    
+    def _unindex_mock_report(self, report: dict) -> None:
+        """Remove a mock report from its geohash bucket."""
+        geohash = report.get('geohash')
+        if geohash:
+            bucket = self._geo_index.get(geohash[:MOCK_INDEX_PRECISION])
+            if bucket:
+                bucket.discard(report['id'])
+    
+    def _mock_candidate_rows(self, lat: float, lon: float,
+                             lat_delta: float, lon_delta: float) -> np.ndarray:
+        """
+        Get the mock column rows that may lie within a search box.
+        
+        Args:
+            lat, lon: Center of the search box
+            lat_delta, lon_delta: Half-height and half-width of the box in degrees
+        
+        Returns:
+            Rows of the reports in the 3x3 geohash buckets around the center,
+            or every live row if the box is larger than one bucket, in insertion order
+        """
+        columns = self._mock_columns
+        lat_bits = 5 * MOCK_INDEX_PRECISION // 2
+        if (lat_delta > 180.0 / (1 << lat_bits)
+                or lon_delta > 360.0 / (1 << (5 * MOCK_INDEX_PRECISION - lat_bits))):
+            return columns.live_rows()
+        
+        rows = np.fromiter(
+            (columns.rows[report_id]
+             for cell in geohash_neighbours(lat, lon, MOCK_INDEX_PRECISION)
+             for report_id in self._geo_index.get(cell, ())),
+            dtype=np.intp
+        )
+        rows.sort()
+        return rows
+    
+    def _query_geohash_cells(self, cells: list,
+                             limit: Optional[int] = None,
+                             fields: Optional[list] = None,
+                             statuses: Optional[list] = None,
+                             equals: Optional[dict] = None) -> list:
+        """
+        Run one geohash range query per cell in parallel.
+        
+        Args:
+            cells: Geohash prefixes to query
+            limit: Maximum number of reports per cell
+            fields: Only return these fields (default: all fields)
+            statuses: Statuses to match server-side when querying the integer
+                geohash; string geohash queries leave status filtering to the caller
+            equals: Field values to match server-side; each combination needs a
+                composite index ending in the geohash field
+        
+        Returns:
+            List of reports from all cells, de-duplicated by ID
+        """
+        collection = self.db.collection('reports')
+        equal_filters = [(name, value) for name, value in (equals or {}).items() if value]
+        
+        def query_cell(prefix):
+            if GEOHASH_INT_QUERIES:
+                # Integer bounds use the (status, geohash_int) composite index
+                field, (start, end) = 'geohash_int', geohash_int_range(prefix)
+            else:
+                field, start, end = 'geohash', prefix, prefix + '\uffff'
+            query = collection
+            if FieldFilter:
+                query = query.where(filter=FieldFilter(field, '>=', start))
+                query = query.where(filter=FieldFilter(field, '<', end))
+                if GEOHASH_INT_QUERIES and statuses:
+                    query = query.where(filter=FieldFilter('status', 'in', list(statuses)))
+                for name, value in equal_filters:
+                    query = query.where(filter=FieldFilter(name, '==', value))
+            else:
+                query = query.where(field, '>=', start)
+                query = query.where(field, '<', end)
+                if GEOHASH_INT_QUERIES and statuses:
+                    query = query.where('status', 'in', list(statuses))
+                for name, value in equal_filters:
+                    query = query.where(name, '==', value)
+            if limit:
+                query = query.limit(limit)
+            if fields:
+                query = query.select(fields)
+            return [doc.to_dict() for doc in query.stream()]
+        
+        # Merge cell results, de-duplicating by ID
+        reports = {}
+        for docs in _EXEC.map(query_cell, cells):
+            for report in docs:
+                reports[report.get('id')] = report
+        return list(reports.values())
+    
+    def get_reports_in_bounds(self, bounds: dict,
+                              status: Optional[str] = None,
+                              issue_type: Optional[str] = None,
+                              limit: int = 500,
+                              fields: Optional[list] = None) -> list:
+        """
+        Get reports inside a geographic bounding box, newest first.
+        Covers the box with up to 9 geohash cells and runs one geohash
+        range query per cell in parallel, with the status and issue type
+        filters applied by Firestore. The merged results are filtered to
+        the exact bounds, sorted by creation time and cut to the limit.
+        
+        Each cell query reads at most `limit` reports, in geohash order,
+        so a single cell holding more matches than that contributes the
+        first `limit` of them rather than its newest.
+        
+        Args:
+            bounds: Geographic bounds {north, south, east, west}
+            status: Filter by status
+            issue_type: Filter by issue type
+            limit: Maximum number of reports to return
+            fields: Only return these fields (default: all fields)
+        
+        Returns:
+            List of reports
+        """
+        north = bounds.get('north', 90)
+        south = bounds.get('south', -90)
+        east = bounds.get('east', 180)
+        west = bounds.get('west', -180)
+        
+        cells = geohash_cells_for_bounds(north, south, east, west)
+        
+        # Coordinates and creation time feed the bounds check and the sort
+        if fields:
+            fields = list({*fields, 'id', 'latitude', 'longitude', 'created_at'})
+        
+        if self.enabled and self.db:
+            if cells:
+                # Served by the (status, issue_type, geohash) composite indexes
+                reports = self._query_geohash_cells(
+                    cells, limit=limit, fields=fields,
+                    equals={'status': status, 'issue_type': issue_type}
+                )
+            else:
+                # A box too large to cover with geohash cells
+                reports = self.get_all_reports(status=status, issue_type=issue_type,
+                                               limit=limit, fields=fields)
+        else:
+            # Mock mode: filter every matching report, all of which are in memory
+            reports = self.get_all_reports(status=status, issue_type=issue_type,
+                                           limit=max(len(self._mock_reports), 1), fields=fields)
+        
+        def in_bounds(report):
+            lat = report.get('latitude')
+            lng = report.get('longitude')
+            if lat is None or lng is None or not south <= lat <= north:
+                return False
+            # Boxes crossing the antimeridian have west > east
+            return west <= lng <= east if west <= east else (lng >= west or lng <= east)
+        
+        reports = [r for r in reports if in_bounds(r)]
+        # Newest first, with the ID as tie-breaker like get_all_reports
+        reports.sort(key=lambda r: (r.get('created_at') or _EPOCH, r.get('id') or ''), reverse=True)
+        return reports[:limit]
+    
+    def backfill_geohash_int(self) -> int:
+        """
+        Add geohash_int to reports created before it was stored.
+        Run once before setting GEOHASH_INT_QUERIES=1.
+        
+        Returns:
+            Number of reports updated
+        """
+        if not (self.enabled and self.db):
+            return 0
+        
+        query = self.db.collection('reports').select(['latitude', 'longitude', 'geohash_int'])
+        writer = self.db.bulk_writer()
+        updated = 0
+        for doc in query.stream():
+            report = doc.to_dict()
+            if 'geohash_int' in report or report.get('latitude') is None or report.get('longitude') is None:
+                continue
+            writer.update(doc.reference, {
+                'geohash_int': encode_geohash_int(report['latitude'], report['longitude'])
+            })
+            updated += 1
+        writer.close()
+        logger.info("Backfilled geohash_int on %s reports", updated)
+        return updated
+    
     def update_report(self, report_id: str, updates: dict) -> bool:
         """
         Update a report.
@@ -371,23 +1090,76 @@ class FirestoreService:
         Returns:
             True if successful, False otherwise
         """
-        updates['updated_at'] = datetime.utcnow()
+        updates['updated_at'] = datetime.now(timezone.utc)
         
         if self.enabled and self.db:
             try:
                 doc_ref = self.db.collection('reports').document(report_id)
                 doc_ref.update(updates)
-                logger.info(f"Updated report {report_id}")
+                logger.info("Updated report %s", report_id)
                 return True
             except Exception as e:
-                logger.error(f"Failed to update report {report_id}: {e}")
+                logger.error("Failed to update report %s: %s", report_id, e)
                 return False
         else:
-            if report_id in self._mock_reports:
-                self._mock_reports[report_id].update(updates)
-                return True
-            return False
-    
+            report = self._mock_reports.get(report_id)
+            if report is None:
+                return False
+            # Moving a report changes its geohash bucket
+            moved = 'latitude' in updates or 'longitude' in updates
+            if moved:
+                self._unindex_mock_report(report)
+            report.update(updates)
+            if moved:
+                report['geohash'] = encode_geohash(report['latitude'], report['longitude'])
+                report['geohash_int'] = encode_geohash_int(report['latitude'], report['longitude'])
+                self._index_mock_report(report)
+            self._mock_columns.set(report)
+            return True
+
+    def bulk_update_reports(self, report_ids: list, updates: dict) -> list:
+        """
+        Apply the same updates to multiple reports.
+        Uses a Firestore BulkWriter so writes are batched and sent in
+        parallel instead of one round-trip per document.
+
+        Args:
+            report_ids: List of report IDs
+            updates: Dictionary of fields to update
+
+        Returns:
+            List of report IDs that failed to update
+        """
+        updates = dict(updates, updated_at=datetime.now(timezone.utc))
+        failed_ids = []
+
+        if self.enabled and self.db:
+            collection = self.db.collection('reports')
+
+            def on_write_error(failure, _writer):
+                failed_ids.append(failure.operation.reference.id)
+                return False  # Don't retry, report as failed
+
+            try:
+                writer = self.db.bulk_writer()
+                writer.on_write_error(on_write_error)
+                for report_id in report_ids:
+                    writer.update(collection.document(report_id), updates)
+                writer.close()
+                logger.info("Bulk updated %s/%s reports", len(report_ids) - len(failed_ids), len(report_ids))
+            except Exception as e:
+                logger.error("Failed to bulk update reports: %s", e)
+                return list(report_ids)
+        else:
+            for report_id in report_ids:
+                if report_id in self._mock_reports:
+                    self._mock_reports[report_id].update(updates)
+                    self._mock_columns.set(self._mock_reports[report_id])
+                else:
+                    failed_ids.append(report_id)
+
+        return failed_ids
+
     def delete_report(self, report_id: str) -> bool:
         """
         Delete a report.
@@ -402,20 +1174,115 @@ class FirestoreService:
             try:
                 doc_ref = self.db.collection('reports').document(report_id)
                 doc_ref.delete()
-                logger.info(f"Deleted report {report_id}")
+                logger.info("Deleted report %s", report_id)
                 return True
             except Exception as e:
-                logger.error(f"Failed to delete report {report_id}: {e}")
+                logger.error("Failed to delete report %s: %s", report_id, e)
                 return False
         else:
-            if report_id in self._mock_reports:
-                del self._mock_reports[report_id]
-                return True
-            return False
+            report = self._mock_reports.pop(report_id, None)
+            if report is None:
+                return False
+            self._unindex_mock_report(report)
+            self._mock_columns.remove(report_id)
+            return True
+    
+    def get_stats(self) -> dict:
+        """
+        Get report counts by status, issue type, and severity.
+        Uses Firestore count() aggregations so only the counts are
+        transferred, not the report documents.
+        
+        Reports missing a bucketed field (or holding null) count towards
+        that group's default value, e.g. severity 'medium', so older
+        records still add up to the total.
+        
+        Returns:
+            Dict with total and by_status/by_type/by_severity counts
+        """
+        if self.enabled and self.db:
+            collection = self.db.collection('reports')
+            queries = {('total', None): collection}
+            for group, (field, _, values) in STATS_BUCKETS.items():
+                for value in values:
+                    queries[(group, value)] = collection.where(field, '==', value)
+                # Matches every string value, so the rest of the total lacks the field
+                queries[(group, None)] = collection.where(field, '>=', '')
+            
+            # Run all aggregations concurrently
+            results = _EXEC.map(lambda q: q.count().get()[0][0].value, queries.values())
+            counts = dict(zip(queries, results))
+            
+            total = counts[('total', None)]
+            stats = {'total': total}
+            for group, (_, default, values) in STATS_BUCKETS.items():
+                stats[group] = {value: counts[(group, value)] for value in values}
+                stats[group][default] += total - counts[(group, None)]
+            return stats
+        else:
+            # Mock mode
+            stats = {'total': len(self._mock_reports)}
+            for group, (field, default, values) in STATS_BUCKETS.items():
+                counts = dict.fromkeys(values, 0)
+                for report in self._mock_reports.values():
+                    value = report.get(field)
+                    if value is None:
+                        value = default
+                    if value in counts:
+                        counts[value] += 1
+                stats[group] = counts
+            return stats
+    
+    def get_reports_version(self, status: Optional[str] = None,
+                            issue_type: Optional[str] = None,
+                            severity: Optional[str] = None) -> str:
+        """
+        Get a freshness token for the reports matching the listing filters.
+        Combines the matching report count with their latest updated_at, so
+        it changes whenever a matching report is created, updated or deleted,
+        or moves in or out of the filters.
+        
+        Args:
+            status: Filter by status
+            issue_type: Filter by issue type
+            severity: Filter by severity
+        
+        Returns:
+            Version string
+        """
+        filters = [(name, value) for name, value in
+                   (('status', status), ('issue_type', issue_type), ('severity', severity)) if value]
+        
+        if self.enabled and self.db:
+            query = self.db.collection('reports')
+            for name, value in filters:
+                query = query.where(name, '==', value)
+            latest_query = (query
+                            .order_by('updated_at', direction=firestore.Query.DESCENDING)
+                            .limit(1)
+                            .select(['updated_at']))
+            
+            def latest_update():
+                docs = [doc.to_dict() for doc in latest_query.stream()]
+                return docs[0].get('updated_at') if docs else None
+            
+            # Run both reads concurrently
+            latest_future = _EXEC.submit(latest_update)
+            total = query.count().get()[0][0].value
+            latest = latest_future.result()
+        else:
+            # Mock mode
+            matching = [r for r in self._mock_reports.values()
+                        if all(r.get(name) == value for name, value in filters)]
+            total = len(matching)
+            latest = max((r['updated_at'] for r in matching if r.get('updated_at')), default=None)
+        
+        return f"{total}:{latest.isoformat() if latest else ''}"
     
     def get_reports_for_heatmap(self, bounds: Optional[dict] = None) -> list:
         """
         Get report data optimized for heatmap visualization.
+        Bounds filtering and weighting run as vectorized NumPy passes.
         
         Args:
             bounds: Optional geographic bounds {north, south, east, west}
@@ -423,53 +1290,44 @@ class FirestoreService:
         Returns:
             List of {lat, lng, weight} for heatmap
         """
-        # Severity weights for heatmap
-        severity_weights = {
-            'high': 1.0,
-            'medium': 0.6,
-            'low': 0.3
-        }
+        if self.enabled and self.db:
+            reports = [
+                r for r in self.get_all_reports(limit=500, fields=_HEATMAP_FIELDS)
+                if r.get('latitude') is not None and r.get('longitude') is not None
+            ]
+            count = len(reports)
+            lats = np.fromiter((r['latitude'] for r in reports), dtype=np.float64, count=count)
+            lngs = np.fromiter((r['longitude'] for r in reports), dtype=np.float64, count=count)
+            severities = np.fromiter((_SEVERITY_CODES.get(r.get('severity', 'low'), 0) for r in reports),
+                                     dtype=np.int8, count=count)
+            resolved = np.fromiter((r.get('status') == 'resolved' for r in reports),
+                                   dtype=np.bool_, count=count)
+        else:
+            # Mock mode reads the first 500 reports straight from the columns
+            columns = self._mock_columns
+            rows = columns.live_rows()[:500]
+            rows = rows[~(np.isnan(columns.lat[rows]) | np.isnan(columns.lon[rows]))]
+            lats = columns.lat[rows]
+            lngs = columns.lon[rows]
+            severities = np.maximum(columns.severity[rows], 0)
+            resolved = columns.status[rows] == _STATUS_CODES['resolved']
         
-        reports = self.get_all_reports(limit=500)
-        heatmap_data = []
+        # Severity weight, increased for unresolved issues
+        weights = _WEIGHT_LUT[severities] * np.where(resolved, 1.0, 1.5)
         
-        for report in reports:
-            lat = report.get('latitude')
-            lng = report.get('longitude')
-            
-            if lat is None or lng is None:
-                continue
-            
-            # Apply bounds filter if provided
-            if bounds:
-                if (lat > bounds.get('north', 90) or 
-                    lat < bounds.get('south', -90) or
-                    lng > bounds.get('east', 180) or 
-                    lng < bounds.get('west', -180)):
-                    continue
-            
-            weight = severity_weights.get(report.get('severity', 'low'), 0.3)
-            
-            # Increase weight for unresolved issues
-            if report.get('status') != 'resolved':
-                weight *= 1.5
-            
-            heatmap_data.append({
-                'lat': lat,
-                'lng': lng,
-                'weight': weight
-            })
+        # Apply bounds filter if provided
+        if bounds:
+            mask = ((lats <= bounds.get('north', 90)) & (lats >= bounds.get('south', -90)) &
+                    (lngs <= bounds.get('east', 180)) & (lngs >= bounds.get('west', -180)))
+            lats, lngs, weights = lats[mask], lngs[mask], weights[mask]
         
-        return heatmap_data
-
-
-# Singleton instance
-_firestore_service = None
+        return [
+            {'lat': lat, 'lng': lng, 'weight': weight}
+            for lat, lng, weight in zip(lats.tolist(), lngs.tolist(), weights.tolist())
+        ]
 
 
+@lru_cache(maxsize=1)
 def get_firestore_service() -> FirestoreService:
     """Get or create the Firestore service singleton."""
-    global _firestore_service
-    if _firestore_service is None:
-        _firestore_service = FirestoreService()
-    return _firestore_service
+    return FirestoreService()
@@ -8,8 +8,16 @@ Detects issue types, classifies severity, and assists in duplicate verification.
 import os
 import logging
 import json
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
 from typing import Optional, Tuple
-import base64
+import binascii
 
 # Google Generative AI (Gemini)
 try:
@@ -18,6 +26,28 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+# orjson (optional) parses the model's JSON faster than the stdlib;
+# its JSONDecodeError subclasses json.JSONDecodeError
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Pillow (optional) downscales photos before they are sent to Gemini
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Perceptual hashing (optional) rejects obvious non-duplicates without a Gemini call
+try:
+    import imagehash
+    PHASH_AVAILABLE = PIL_AVAILABLE
+except ImportError:
+    PHASH_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,6 +66,29 @@ SEVERITY_LEVELS = {
     'high': 'Severe issue, requires immediate attention'
 }
 
+# Valid values after normalization; the model may also answer "none"
+_VALID_ISSUE_TYPES = frozenset(ISSUE_TYPES) | {'none'}
+_VALID_SEVERITIES = frozenset(SEVERITY_LEVELS)
+
+# Outermost JSON object in a model response, which may wrap it in prose or code fences
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# In-process cache of analyses, keyed by image content hash
+ANALYSIS_CACHE_SIZE = 1024
+ANALYSIS_CACHE_TTL = 3600  # seconds
+
+# Gemini resizes images internally, so larger uploads are downscaled to
+# this long edge and re-encoded as JPEG before sending
+GEMINI_IMAGE_MAX_EDGE = 1024
+GEMINI_IMAGE_QUALITY = 85
+
+# Image pairs whose 16x16 pHashes differ in more bits than this are
+# treated as different scenes without asking Gemini
+PHASH_REJECT_DISTANCE = int(os.environ.get('PHASH_REJECT_DISTANCE', 20))
+
+# Pool for fanning out independent Gemini requests; they are network-bound
+_EXEC = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gemini')
+
 
 class GeminiService:
     """Service class for Gemini AI operations."""
@@ -51,7 +104,7 @@ class GeminiService:
                 self.enabled = True
                 logger.info("Gemini client initialized successfully")
             except Exception as e:
-                logger.warning(f"Failed to initialize Gemini: {e}")
+                logger.warning("Failed to initialize Gemini: %s", e)
                 self.client = None
                 self.enabled = False
         else:
@@ -61,6 +114,60 @@ class GeminiService:
                 logger.warning("GEMINI_API_KEY not set")
             self.client = None
             self.enabled = False
+        
+        self._analysis_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def _get_cached_analysis(self, key: bytes) -> Optional[dict]:
+        """Return a cached analysis if present and not expired."""
+        with self._cache_lock:
+            entry = self._analysis_cache.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._analysis_cache[key]
+                return None
+            self._analysis_cache.move_to_end(key)
+            return dict(result)
+    
+    def _cache_analysis(self, key: bytes, result: dict):
+        """Store an analysis, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._analysis_cache[key] = (time.monotonic() + ANALYSIS_CACHE_TTL, dict(result))
+            self._analysis_cache.move_to_end(key)
+            if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+    
+    def _prepare_image(self, image_data: bytes, mime_type: str) -> Tuple[bytes, str]:
+        """
+        Downscale an image for Gemini and strip its metadata.
+        
+        Args:
+            image_data: Binary image data
+            mime_type: MIME type of the image
+        
+        Returns:
+            Tuple of (image data, MIME type); the original image if it is
+            already small enough or can't be decoded
+        """
+        if not PIL_AVAILABLE:
+            return image_data, mime_type
+        try:
+            image = Image.open(BytesIO(image_data))
+            if max(image.size) <= GEMINI_IMAGE_MAX_EDGE:
+                return image_data, mime_type
+            # Let JPEG decode at reduced size before the exact resize
+            image.draft('RGB', (2 * GEMINI_IMAGE_MAX_EDGE, 2 * GEMINI_IMAGE_MAX_EDGE))
+            # Apply the EXIF orientation, since the metadata is dropped on re-encode
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail((GEMINI_IMAGE_MAX_EDGE, GEMINI_IMAGE_MAX_EDGE), Image.LANCZOS)
+            output = BytesIO()
+            image.save(output, format='JPEG', quality=GEMINI_IMAGE_QUALITY)
+            return output.getvalue(), 'image/jpeg'
+        except Exception as e:
+            logger.warning("Failed to downscale image for Gemini: %s", e)
+            return image_data, mime_type
     
     def analyze_image(self, image_data: bytes, 
                       mime_type: str = 'image/jpeg') -> dict:
@@ -78,9 +185,15 @@ class GeminiService:
             # Return mock analysis for development
             return self._mock_analysis()
         
+        # The same photo is often analyzed twice (/api/analyze, then submit)
+        cache_key = hashlib.blake2b(image_data, digest_size=16).digest()
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            logger.info("Gemini analysis served from cache")
+            return cached
+        
         try:
-            # Convert image data to base64
-            image_b64 = base64.b64encode(image_data).decode('utf-8')
+            image_data, mime_type = self._prepare_image(image_data, mime_type)
             
             # Analysis prompt
             prompt = """Analyze this image and determine if it shows any public infrastructure issue.
@@ -116,7 +229,7 @@ Consider these severity criteria:
                     {
                         "inline_data": {
                             "mime_type": mime_type,
-                            "data": image_b64
+                            "data": image_data
                         }
                     }
                 ]
@@ -124,11 +237,15 @@ Consider these severity criteria:
             
             # Parse the response
             result = self._parse_analysis_response(response.text)
-            logger.info(f"Gemini analysis complete: {result['issue_type']} ({result['severity']})")
+            logger.info("Gemini analysis complete: %s (%s)", result['issue_type'], result['severity'])
+            
+            # Only cache real analyses, not fallbacks
+            if result.get('ai_analyzed'):
+                self._cache_analysis(cache_key, result)
             return result
             
         except Exception as e:
-            logger.error(f"Gemini analysis failed: {e}")
+            logger.error("Gemini analysis failed: %s", e)
             return self._mock_analysis(error=str(e))
     
     def analyze_image_from_base64(self, base64_data: str) -> dict:
@@ -144,8 +261,9 @@ Consider these severity criteria:
         try:
             # Detect MIME type and extract base64 data
             mime_type = 'image/jpeg'
-            if ',' in base64_data:
-                header, base64_data = base64_data.split(',', 1)
+            header, sep, payload = base64_data.partition(',')
+            if sep:
+                base64_data = payload
                 if 'image/png' in header:
                     mime_type = 'image/png'
                 elif 'image/gif' in header:
@@ -154,24 +272,52 @@ Consider these severity criteria:
                     mime_type = 'image/webp'
             
             # Decode base64
-            image_data = base64.b64decode(base64_data)
+            image_data = binascii.a2b_base64(base64_data)
             
             return self.analyze_image(image_data, mime_type)
             
         except Exception as e:
-            logger.error(f"Failed to analyze base64 image: {e}")
+            logger.error("Failed to analyze base64 image: %s", e)
             return self._mock_analysis(error=str(e))
     
+    def perceptual_hash(self, image_data: bytes) -> Optional[str]:
+        """
+        Compute a 16x16 perceptual hash of an image.
+        Reports can store it so their side of a comparison is precomputed.
+        
+        Args:
+            image_data: Binary image data
+        
+        Returns:
+            Hex pHash, or None if imagehash is unavailable or the image can't be decoded
+        """
+        if not PHASH_AVAILABLE:
+            return None
+        try:
+            image = Image.open(BytesIO(image_data))
+            # Let JPEG decode at reduced size; the hash only needs a thumbnail
+            image.draft('L', (256, 256))
+            return str(imagehash.phash(image, hash_size=16))
+        except Exception as e:
+            logger.warning("Failed to compute perceptual hash: %s", e)
+            return None
+    
     def compare_images_for_duplicate(self, image1_data: bytes, 
                                      image2_data: bytes,
-                                     distance_meters: float) -> dict:
+                                     distance_meters: float,
+                                     image1_phash: Optional[str] = None,
+                                     image2_phash: Optional[str] = None) -> dict:
         """
         Compare two images to determine if they show the same issue.
+        Pairs whose perceptual hashes are far apart are rejected
+        without calling Gemini.
         
         Args:
             image1_data: First image binary data
             image2_data: Second image binary data
             distance_meters: Distance between the two report locations
+            image1_phash: Precomputed perceptual hash of the first image
+            image2_phash: Precomputed perceptual hash of the second image
         
         Returns:
             Comparison result with is_duplicate and confidence
@@ -185,9 +331,20 @@ Consider these severity criteria:
                 'reasoning': 'Mock comparison based on proximity'
             }
         
+        image1_phash = image1_phash or self.perceptual_hash(image1_data)
+        image2_phash = image2_phash or self.perceptual_hash(image2_data)
+        if image1_phash and image2_phash:
+            hamming = imagehash.hex_to_hash(image1_phash) - imagehash.hex_to_hash(image2_phash)
+            if hamming > PHASH_REJECT_DISTANCE:
+                return {
+                    'is_duplicate': False,
+                    'confidence': 0.9,
+                    'reasoning': f'Images differ visually (pHash distance {hamming})'
+                }
+        
         try:
-            image1_b64 = base64.b64encode(image1_data).decode('utf-8')
-            image2_b64 = base64.b64encode(image2_data).decode('utf-8')
+            image1_data, image1_mime = self._prepare_image(image1_data, 'image/jpeg')
+            image2_data, image2_mime = self._prepare_image(image2_data, 'image/jpeg')
             
             prompt = f"""Compare these two images of reported infrastructure issues.
 They were taken {distance_meters:.1f} meters apart.
@@ -212,14 +369,14 @@ Respond in JSON format:
                     prompt,
                     {
                         "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": image1_b64
+                            "mime_type": image1_mime,
+                            "data": image1_data
                         }
                     },
                     {
                         "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": image2_b64
+                            "mime_type": image2_mime,
+                            "data": image2_data
                         }
                     }
                 ]
@@ -228,31 +385,53 @@ Respond in JSON format:
             return self._parse_duplicate_response(response.text)
             
         except Exception as e:
-            logger.error(f"Duplicate comparison failed: {e}")
+            logger.error("Duplicate comparison failed: %s", e)
             return {
                 'is_duplicate': distance_meters < 5,
                 'confidence': 0.5,
                 'reasoning': f'Fallback comparison due to error: {str(e)}'
             }
     
+    def compare_images_for_duplicates(self, image_data: bytes,
+                                      candidates: list) -> list:
+        """
+        Compare an image against several candidate reports concurrently.
+        
+        Args:
+            image_data: New image binary data
+            candidates: List of (candidate image data, distance in meters) or
+                (candidate image data, distance in meters, candidate pHash) tuples
+        
+        Returns:
+            Comparison results, in the same order as candidates
+        """
+        # Hash the new image once rather than once per candidate
+        image_phash = self.perceptual_hash(image_data) if self.enabled else None
+        return list(_EXEC.map(
+            lambda candidate: self.compare_images_for_duplicate(
+                image_data, candidate[0], candidate[1],
+                image1_phash=image_phash,
+                image2_phash=candidate[2] if len(candidate) > 2 else None
+            ),
+            candidates
+        ))
+    
     def _parse_analysis_response(self, response_text: str) -> dict:
         """Parse the analysis response from Gemini."""
         try:
             # Try to extract JSON from the response
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+            match = _JSON_RE.search(response_text)
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                result = json.loads(json_str)
+            if match:
+                result = _json_loads(match.group())
                 
                 # Validate and normalize
                 issue_type = result.get('issue_type', 'other').lower()
-                if issue_type not in ISSUE_TYPES and issue_type != 'none':
+                if issue_type not in _VALID_ISSUE_TYPES:
                     issue_type = 'other'
                 
                 severity = result.get('severity', 'medium').lower()
-                if severity not in SEVERITY_LEVELS:
+                if severity not in _VALID_SEVERITIES:
                     severity = 'medium'
                 
                 return {
@@ -264,7 +443,7 @@ Respond in JSON format:
                     'ai_analyzed': True
                 }
         except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"Failed to parse Gemini response: {e}")
+            logger.warning("Failed to parse Gemini response: %s", e)
         
         # Default response if parsing fails
         return self._mock_analysis()
@@ -272,12 +451,10 @@ Respond in JSON format:
     def _parse_duplicate_response(self, response_text: str) -> dict:
         """Parse the duplicate comparison response from Gemini."""
         try:
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}') + 1
+            match = _JSON_RE.search(response_text)
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end]
-                result = json.loads(json_str)
+            if match:
+                result = _json_loads(match.group())
                 
                 return {
                     'is_duplicate': bool(result.get('is_duplicate', False)),
@@ -285,7 +462,7 @@ Respond in JSON format:
                     'reasoning': result.get('reasoning', 'AI comparison')
                 }
         except (json.JSONDecodeError, ValueError) as e:
-            logger.warning(f"Failed to parse duplicate response: {e}")
+            logger.warning("Failed to parse duplicate response: %s", e)
         
         return {
             'is_duplicate': False,
@@ -306,13 +483,7 @@ Respond in JSON format:
         }
 
 
-# Singleton instance
-_gemini_service = None
-
-
+@lru_cache(maxsize=1)
 def get_gemini_service() -> GeminiService:
     """Get or create the Gemini service singleton."""
-    global _gemini_service
-    if _gemini_service is None:
-        _gemini_service = GeminiService()
-    return _gemini_service
+    return GeminiService()
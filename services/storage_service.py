@@ -6,26 +6,138 @@ Handles image upload and storage in Google Cloud Storage.
 
 import os
 import logging
-import uuid
-from datetime import datetime
-from typing import Optional, Tuple
-import base64
+import binascii
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import lru_cache
+from io import BytesIO
+from types import MappingProxyType
+from typing import BinaryIO, Optional, Tuple, Union
+from urllib.parse import unquote
 
 # Google Cloud Storage
 try:
+    import google.auth
+    from google.auth.credentials import with_scopes_if_required
+    from google.auth.transport.requests import AuthorizedSession
     from google.cloud import storage
     from google.oauth2 import service_account
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    from google.api_core.exceptions import NotFound
     GCS_AVAILABLE = True
 except ImportError:
     GCS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive connections to GCS; the default pool of 10 is smaller than the
+# number of request threads, so surplus connections were dropped and re-handshaken
+HTTP_POOL_SIZE = int(os.environ.get('GUNICORN_THREADS', 32))
+
+# Transient GCS 5xx responses are retried on the pooled connection rather than
+# surfacing as failed uploads (urllib3 only retries idempotent methods)
+_HTTP_RETRY_STATUSES = (500, 502, 503, 504)
+
+# MIME type for each allowed image extension
+_CONTENT_TYPES = MappingProxyType({
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+})
+_DEFAULT_CONTENT_TYPE = 'image/jpeg'
+# Extension length bounds, checked before lowercasing and hashing a filename's tail
+_EXT_MIN_LEN = min(map(len, _CONTENT_TYPES))
+_EXT_MAX_LEN = max(map(len, _CONTENT_TYPES))
+
+# Signed URLs are the fallback when a blob can't be made public
+_SIGNED_URL_KWARGS = MappingProxyType({
+    'version': 'v4',
+    'expiration': timedelta(days=365),  # 1 year expiration
+    'method': 'GET'
+})
+
+# Data URL prefixes are short; payloads are only searched this far for the comma
+_DATA_URL_HEADER_MAX = 128
+_DATA_URL_IMAGE_RE = re.compile(r'image/(png|gif|webp|jpe?g)')
+
+# Mock-mode uploads kept in memory; the oldest are dropped beyond this
+MOCK_FILES_MAX = 128
+
+# Return mock://<id> URLs from mock uploads and encode data URLs only on demand
+# via get_mock_data_url(); off by default since pages render image_url directly
+MOCK_LAZY_URLS = os.environ.get('MOCK_LAZY_URLS', '0') == '1'
+_MOCK_URL_PREFIX = 'mock://'
+
+# Uploads above this size go up in resumable chunks, so a dropped connection
+# resends one chunk rather than the whole image
+_RESUMABLE_THRESHOLD = int(os.environ.get('GCS_RESUMABLE_THRESHOLD', 5 * 1024 * 1024))
+# GCS requires chunk sizes in multiples of 256KB; round down, keeping at least one
+_RESUMABLE_CHUNK_SIZE = max(
+    int(os.environ.get('GCS_RESUMABLE_CHUNK_SIZE', 4 * 1024 * 1024)) // (256 * 1024), 1
+) * 256 * 1024
+
+# Pool for concurrent uploads; GCS media uploads can't be batched into one request
+_EXEC = ThreadPoolExecutor(max_workers=int(os.environ.get('GCS_UPLOAD_WORKERS', 8)),
+                           thread_name_prefix='gcs-upload')
+
+# Warm the GCS connection pool when the service is created
+GCS_WARMUP = os.environ.get('GCS_WARMUP', '1') == '1'
+
+# GCS caps a batch request at 100 sub-requests
+_BATCH_MAX = 100
+
+# Bytes encoded per base64 step when building data URLs (a multiple of 3)
+_B64_CHUNK = 57 * 1024
+
+
+def _data_url(mime_type: str, data: bytes) -> str:
+    """
+    Build a base64 data URL, encoding in chunks into one preallocated
+    buffer instead of materializing the full encoding more than once.
+    """
+    prefix = f"data:{mime_type};base64,".encode('ascii')
+    buffer = bytearray(len(prefix) + (len(data) + 2) // 3 * 4)
+    buffer[:len(prefix)] = prefix
+    position = len(prefix)
+    view = memoryview(data)
+    for start in range(0, len(data), _B64_CHUNK):
+        encoded = binascii.b2a_base64(view[start:start + _B64_CHUNK], newline=False)
+        buffer[position:position + len(encoded)] = encoded
+        position += len(encoded)
+    return buffer.decode('ascii')
+
+
+@lru_cache(maxsize=1)
+def _load_credentials(project_id: str, client_email: str, private_key: str):
+    """
+    Parse service account credentials from environment values.
+    
+    Cached so re-creating the service (e.g. in tests) skips re-parsing the RSA key.
+    """
+    if '\\n' in private_key:
+        private_key = private_key.replace('\\n', '\n')
+    
+    creds_dict = {
+        "type": "service_account",
+        "project_id": project_id,
+        "private_key": private_key,
+        "client_email": client_email,
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+    return service_account.Credentials.from_service_account_info(creds_dict)
+
 
 class StorageService:
     """Service class for Google Cloud Storage operations."""
     
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    ALLOWED_EXTENSIONS = frozenset(_CONTENT_TYPES)
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
     
     def __init__(self):
@@ -35,6 +147,8 @@ class StorageService:
             or os.environ.get('FIREBASE_STORAGE_BUCKET')
             or 'infrabeacon-images'
         )
+        # Object URLs embed '<bucket>/<blob>'; delete_image locates the blob after it
+        self._bucket_prefix = f'{self.bucket_name}/'
         
         if GCS_AVAILABLE:
             try:
@@ -50,28 +164,29 @@ class StorageService:
                     if "firebase-adminsdk-xxx" in client_email:
                         logger.warning("Using placeholder credentials - skipping explicit creds initialization")
                     else:
-                        if '\\n' in private_key:
-                            private_key = private_key.replace('\\n', '\n')
-                        
-                        creds_dict = {
-                            "type": "service_account",
-                            "project_id": project_id,
-                            "private_key": private_key,
-                            "client_email": client_email,
-                            "token_uri": "https://oauth2.googleapis.com/token",
-                        }
-                        creds = service_account.Credentials.from_service_account_info(creds_dict)
+                        creds = _load_credentials(project_id, client_email, private_key)
                         logger.info("Using credentials from environment variables")
 
+                if creds is None:
+                    creds, _ = google.auth.default(scopes=storage.Client.SCOPE)
+                
+                # Our own session, so the pool size and retries are set through
+                # the public requests API rather than the client's internals
+                session = AuthorizedSession(with_scopes_if_required(creds, storage.Client.SCOPE))
+                session.mount('https://', HTTPAdapter(
+                    pool_connections=4, pool_maxsize=HTTP_POOL_SIZE,
+                    max_retries=Retry(total=3, backoff_factor=0.5,
+                                      status_forcelist=_HTTP_RETRY_STATUSES)
+                ))
                 if project_id:
-                    self.client = storage.Client(project=project_id, credentials=creds)
+                    self.client = storage.Client(project=project_id, credentials=creds, _http=session)
                 else:
-                    self.client = storage.Client(credentials=creds)
+                    self.client = storage.Client(credentials=creds, _http=session)
                 self.bucket = self.client.bucket(self.bucket_name)
                 self.enabled = True
-                logger.info(f"GCS client initialized for bucket: {self.bucket_name}")
+                logger.info("GCS client initialized for bucket: %s", self.bucket_name)
             except Exception as e:
-                logger.warning(f"Failed to initialize GCS: {e}")
+                logger.warning("Failed to initialize GCS: %s", e)
                 self.client = None
                 self.bucket = None
                 self.enabled = False
@@ -81,28 +196,83 @@ class StorageService:
             self.bucket = None
             self.enabled = False
         
-        # Mock storage for development
-        self._mock_files = {}
+        # Mock storage for development, bounded so long dev sessions don't grow forever
+        self._mock_files = OrderedDict()
+        self._mock_lock = threading.Lock()
+        
+        # Open a pooled connection in the background so the first upload
+        # doesn't pay for DNS and the TLS handshake
+        if self.enabled and GCS_WARMUP:
+            _EXEC.submit(self._warmup)
     
-    def _allowed_file(self, filename: str) -> bool:
-        """Check if file extension is allowed."""
-        return '.' in filename and \
-               filename.rsplit('.', 1)[1].lower() in self.ALLOWED_EXTENSIONS
+    def _warmup(self):
+        """Make one cheap bucket request to establish a keep-alive connection."""
+        try:
+            self.bucket.exists()
+            logger.info("GCS connection warmed up")
+        except Exception as e:
+            # Even a permission error leaves the connection open for reuse
+            logger.debug("GCS warmup request failed: %s", e)
     
-    def _generate_filename(self, original_filename: str) -> str:
+    def _mock_put(self, key: str, value: dict):
+        """Store a mock upload, evicting the oldest once over MOCK_FILES_MAX."""
+        with self._mock_lock:
+            self._mock_files[key] = value
+            self._mock_files.move_to_end(key)
+            while len(self._mock_files) > MOCK_FILES_MAX:
+                self._mock_files.popitem(last=False)
+    
+    def _extract_ext(self, filename: str) -> Optional[str]:
+        """Return the lowercased file extension, or None if it isn't allowed."""
+        dot = filename.rfind('.')
+        if dot < 0 or not _EXT_MIN_LEN <= len(filename) - dot - 1 <= _EXT_MAX_LEN:
+            return None
+        ext = filename[dot + 1:].lower()
+        return ext if ext in self.ALLOWED_EXTENSIONS else None
+    
+    def _generate_filename(self, ext: str) -> str:
         """Generate a unique filename for storage."""
-        ext = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else 'jpg'
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        unique_id = uuid.uuid4().hex[:8]
-        return f"reports/{timestamp}_{unique_id}.{ext}"
+        t = time.gmtime()
+        timestamp = (f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}_"
+                     f"{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}")
+        return f"reports/{timestamp}_{os.urandom(4).hex()}.{ext}"
     
-    def upload_image(self, file_data: bytes, original_filename: str, 
+    @staticmethod
+    def _payload_size(file_data: Union[bytes, BinaryIO]) -> int:
+        """Size of bytes or a seekable stream, leaving the stream at its start."""
+        if isinstance(file_data, (bytes, bytearray)):
+            return len(file_data)
+        file_data.seek(0, os.SEEK_END)
+        size = file_data.tell()
+        file_data.seek(0)
+        return size
+    
+    def validate_upload(self, file_data: Union[bytes, BinaryIO],
+                        original_filename: str) -> Optional[str]:
+        """
+        Check an image's type and size without uploading it.
+        
+        Args:
+            file_data: Binary image data, or a seekable binary file object
+            original_filename: Original filename for extension detection
+        
+        Returns:
+            Error message if the upload would be rejected, None otherwise
+        """
+        if self._extract_ext(original_filename) is None:
+            return "Invalid file type. Allowed: png, jpg, jpeg, gif, webp"
+        if self._payload_size(file_data) > self.MAX_FILE_SIZE:
+            return "File too large. Maximum size: 16MB"
+        return None
+    
+    def upload_image(self, file_data: Union[bytes, BinaryIO], original_filename: str, 
                      content_type: Optional[str] = None) -> Tuple[bool, str]:
         """
         Upload an image to Cloud Storage.
         
         Args:
-            file_data: Binary image data
+            file_data: Binary image data, or a seekable binary file object
+                that is streamed to storage without being read into memory
             original_filename: Original filename for extension detection
             content_type: MIME type of the file
         
@@ -110,15 +280,18 @@ class StorageService:
             Tuple of (success, url_or_error_message)
         """
         # Validate file extension
-        if not self._allowed_file(original_filename):
+        ext = self._extract_ext(original_filename)
+        if ext is None:
             return False, "Invalid file type. Allowed: png, jpg, jpeg, gif, webp"
         
         # Validate file size
-        if len(file_data) > self.MAX_FILE_SIZE:
+        is_stream = not isinstance(file_data, (bytes, bytearray))
+        size = self._payload_size(file_data)
+        if size > self.MAX_FILE_SIZE:
             return False, "File too large. Maximum size: 16MB"
         
         # Generate unique filename
-        blob_name = self._generate_filename(original_filename)
+        blob_name = self._generate_filename(ext)
         
         if self.enabled and self.bucket:
             try:
@@ -128,80 +301,97 @@ class StorageService:
                 if content_type:
                     blob.content_type = content_type
                 else:
-                    ext = original_filename.rsplit('.', 1)[1].lower()
-                    content_types = {
-                        'jpg': 'image/jpeg',
-                        'jpeg': 'image/jpeg',
-                        'png': 'image/png',
-                        'gif': 'image/gif',
-                        'webp': 'image/webp'
-                    }
-                    blob.content_type = content_types.get(ext, 'image/jpeg')
+                    blob.content_type = _CONTENT_TYPES.get(ext, _DEFAULT_CONTENT_TYPE)
                 
-                # Upload
-                blob.upload_from_string(file_data, content_type=blob.content_type)
+                # Upload from a stream either way; BytesIO shares the bytes' buffer
+                # instead of copying it, unlike upload_from_string
+                if size > _RESUMABLE_THRESHOLD:
+                    blob.chunk_size = _RESUMABLE_CHUNK_SIZE
+                blob.upload_from_file(file_data if is_stream else BytesIO(file_data),
+                                      size=size, content_type=blob.content_type,
+                                      checksum='crc32c')
                 
                 # Make the blob publicly accessible
                 try:
                     blob.make_public()
                     public_url = blob.public_url
-                    logger.info(f"Uploaded image (public): {public_url}")
+                    logger.info("Uploaded image (public): %s", public_url)
                     return True, public_url
                 except Exception as public_error:
                     # If can't make public, try signed URL with longer expiration
-                    logger.warning(f"Could not make blob public: {public_error}, using signed URL")
-                    from datetime import timedelta
+                    logger.warning("Could not make blob public: %s, using signed URL", public_error)
                     try:
-                        signed_url = blob.generate_signed_url(
-                            version="v4",
-                            expiration=timedelta(days=365),  # 1 year expiration
-                            method="GET"
-                        )
-                        logger.info(f"Uploaded image (signed URL): {signed_url}")
+                        signed_url = blob.generate_signed_url(**_SIGNED_URL_KWARGS)
+                        logger.info("Uploaded image (signed URL): %s", signed_url)
                         return True, signed_url
                     except Exception as sign_error:
                         # Fall back to Firebase Storage URL format
-                        logger.warning(f"Could not generate signed URL: {sign_error}, using direct URL")
+                        logger.warning("Could not generate signed URL: %s, using direct URL", sign_error)
                         # Firebase Storage compatible URL
                         firebase_url = f"https://firebasestorage.googleapis.com/v0/b/{self.bucket_name}/o/{blob_name.replace('/', '%2F')}?alt=media"
-                        logger.info(f"Uploaded image (firebase URL): {firebase_url}")
+                        logger.info("Uploaded image (firebase URL): %s", firebase_url)
                         return True, firebase_url
                 
             except Exception as e:
-                logger.error(f"Failed to upload image: {e}")
+                logger.error("Failed to upload image: %s", e)
                 return False, f"Upload failed: {str(e)}"
         else:
             # Mock mode - store as base64 data URL
             try:
-                ext = original_filename.rsplit('.', 1)[1].lower()
-                content_types = {
-                    'jpg': 'image/jpeg',
-                    'jpeg': 'image/jpeg',
-                    'png': 'image/png',
-                    'gif': 'image/gif',
-                    'webp': 'image/webp'
-                }
-                mime_type = content_types.get(ext, 'image/jpeg')
+                mime_type = _CONTENT_TYPES.get(ext, _DEFAULT_CONTENT_TYPE)
+                if is_stream:
+                    file_data = file_data.read()
                 
                 # Store and return a mock URL
-                mock_id = uuid.uuid4().hex[:8]
-                self._mock_files[mock_id] = {
+                mock_id = os.urandom(4).hex()
+                self._mock_put(mock_id, {
                     'data': file_data,
                     'content_type': mime_type,
                     'filename': blob_name
-                }
+                })
                 
-                # Return a data URL for immediate display
-                b64_data = base64.b64encode(file_data).decode('utf-8')
-                data_url = f"data:{mime_type};base64,{b64_data}"
+                logger.info("Created mock image with ID: %s", mock_id)
+                if MOCK_LAZY_URLS:
+                    return True, f"{_MOCK_URL_PREFIX}{mock_id}"
                 
-                logger.info(f"Created mock image with ID: {mock_id}")
-                return True, data_url
+                # Return a data URL for immediate display
+                return True, _data_url(mime_type, file_data)
                 
             except Exception as e:
-                logger.error(f"Mock upload failed: {e}")
+                logger.error("Mock upload failed: %s", e)
                 return False, f"Upload failed: {str(e)}"
     
+    def upload_images_batch(self, items: list) -> list:
+        """
+        Upload several images concurrently.
+        
+        Args:
+            items: List of (file_data, original_filename) or
+                (file_data, original_filename, content_type) tuples
+        
+        Returns:
+            List of (success, url_or_error_message) tuples, in the same order as items
+        """
+        return list(_EXEC.map(lambda item: self.upload_image(*item), items))
+    
+    def get_mock_data_url(self, mock_id: str) -> Optional[str]:
+        """
+        Encode a mock upload as a data URL.
+        
+        Args:
+            mock_id: Mock image ID, or the mock:// URL returned by upload_image
+        
+        Returns:
+            Data URL, or None if the upload is unknown or was evicted
+        """
+        if mock_id.startswith(_MOCK_URL_PREFIX):
+            mock_id = mock_id[len(_MOCK_URL_PREFIX):]
+        with self._mock_lock:
+            entry = self._mock_files.get(mock_id)
+        if entry is None:
+            return None
+        return _data_url(entry['content_type'], entry['data'])
+    
     def upload_from_base64(self, base64_data: str, 
                            filename: str = "upload.jpg") -> Tuple[bool, str]:
         """
@@ -216,37 +406,47 @@ class StorageService:
         """
         try:
             # Remove data URL prefix if present
-            if ',' in base64_data:
-                # Format: data:image/jpeg;base64,/9j/4AAQ...
-                header, base64_data = base64_data.split(',', 1)
+            # Format: data:image/jpeg;base64,/9j/4AAQ...
+            comma = base64_data.find(',', 0, _DATA_URL_HEADER_MAX)
+            if comma != -1:
                 # Extract content type from header
-                if 'image/png' in header:
-                    filename = "upload.png"
-                elif 'image/gif' in header:
-                    filename = "upload.gif"
-                elif 'image/webp' in header:
-                    filename = "upload.webp"
+                match = _DATA_URL_IMAGE_RE.search(base64_data, 0, comma)
+                if match:
+                    filename = f"upload.{match.group(1)}"
+                base64_data = base64_data[comma + 1:]
             
-            # Decode base64
-            file_data = base64.b64decode(base64_data)
+            # Reject oversized payloads from the encoded length, before decoding
+            # them into memory only for upload_image to refuse them
+            decoded_size = len(base64_data) * 3 // 4 - base64_data.count('=', -2)
+            if decoded_size > self.MAX_FILE_SIZE:
+                return False, "File too large. Maximum size: 16MB"
             
-            # Get content type from filename
-            ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'jpg'
-            content_types = {
-                'jpg': 'image/jpeg',
-                'jpeg': 'image/jpeg',
-                'png': 'image/png',
-                'gif': 'image/gif',
-                'webp': 'image/webp'
-            }
-            content_type = content_types.get(ext, 'image/jpeg')
+            # Decode base64; binascii reads the str directly, where b64decode
+            # first copies it to ASCII bytes
+            file_data = binascii.a2b_base64(base64_data)
             
-            return self.upload_image(file_data, filename, content_type)
+            # upload_image derives the content type from the filename's extension
+            return self.upload_image(file_data, filename)
             
         except Exception as e:
-            logger.error(f"Failed to decode base64 image: {e}")
+            logger.error("Failed to decode base64 image: %s", e)
             return False, f"Invalid image data: {str(e)}"
     
+    def _url_to_blob_name(self, image_url: str) -> str:
+        """
+        Extract the blob name from an image URL.
+        
+        URL format: https://storage.googleapis.com/bucket-name/blob-name,
+        with a query string on signed and Firebase URLs.
+        """
+        idx = image_url.rfind(self._bucket_prefix)
+        blob_name = image_url[idx + len(self._bucket_prefix):] if idx != -1 else image_url
+        blob_name = blob_name.partition('?')[0]
+        if blob_name.startswith('o/'):
+            # Firebase format: .../b/bucket-name/o/url-encoded-blob-name
+            blob_name = unquote(blob_name[2:])
+        return blob_name
+    
     def delete_image(self, image_url: str) -> bool:
         """
         Delete an image from Cloud Storage.
@@ -261,25 +461,55 @@ class StorageService:
             return True  # Mock mode - always succeed
         
         try:
-            # Extract blob name from URL
-            # URL format: https://storage.googleapis.com/bucket-name/blob-name
-            blob_name = image_url.split(f'{self.bucket_name}/')[-1]
+            blob_name = self._url_to_blob_name(image_url)
             blob = self.bucket.blob(blob_name)
             blob.delete()
-            logger.info(f"Deleted image: {blob_name}")
+            logger.info("Deleted image: %s", blob_name)
             return True
         except Exception as e:
-            logger.error(f"Failed to delete image: {e}")
+            logger.error("Failed to delete image: %s", e)
             return False
+    
+    def delete_images(self, image_urls: list) -> list:
+        """
+        Delete several images, sending up to 100 deletes per batch request.
+        
+        Args:
+            image_urls: Public URLs of the images
+        
+        Returns:
+            List of booleans (True if deleted), in the same order as image_urls
+        """
+        if not self.enabled or not self.bucket:
+            return [True] * len(image_urls)  # Mock mode - always succeed
+        
+        results = []
+        for start in range(0, len(image_urls), _BATCH_MAX):
+            chunk = image_urls[start:start + _BATCH_MAX]
+            blob_names = [self._url_to_blob_name(image_url) for image_url in chunk]
+            try:
+                with self.client.batch():
+                    for blob_name in blob_names:
+                        self.bucket.blob(blob_name).delete()
+                results.extend([True] * len(chunk))
+                logger.info("Deleted %s images in one batch", len(chunk))
+            except Exception as e:
+                # A batch fails as a whole; retry one by one to find the bad URLs.
+                # Blobs the batch already removed are gone, which counts as success.
+                logger.warning("Batch image delete failed: %s, retrying individually", e)
+                for blob_name in blob_names:
+                    try:
+                        self.bucket.blob(blob_name).delete()
+                        results.append(True)
+                    except NotFound:
+                        results.append(True)
+                    except Exception as delete_error:
+                        logger.error("Failed to delete image %s: %s", blob_name, delete_error)
+                        results.append(False)
+        return results
 
 
-# Singleton instance
-_storage_service = None
-
-
+@lru_cache(maxsize=1)
 def get_storage_service() -> StorageService:
     """Get or create the Storage service singleton."""
-    global _storage_service
-    if _storage_service is None:
-        _storage_service = StorageService()
-    return _storage_service
+    return StorageService()
@@ -0,0 +1,32 @@
+"""Tests for the admin API routes in mock mode."""
+
+import unittest
+
+from app import create_app
+from services.firestore_service import get_firestore_service
+
+
+class UpdateReportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.report_id = get_firestore_service().create_report({'latitude': 3.0, 'longitude': 3.0})
+
+    def test_non_object_body_is_rejected(self):
+        for body in (['status'], 'verified', 7):
+            response = self.client.patch(f'/admin/api/reports/{self.report_id}', json=body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.get_json(), {'error': 'Request body must be a JSON object'})
+
+    def test_valid_update_is_applied(self):
+        response = self.client.patch(f'/admin/api/reports/{self.report_id}', json={'status': 'verified'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['report']['status'], 'verified')
+
+
+if __name__ == '__main__':
+    unittest.main()
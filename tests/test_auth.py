@@ -0,0 +1,54 @@
+"""Tests for the admin login_required decorator."""
+
+import os
+import unittest
+from unittest import mock
+
+from flask import session
+
+from app import create_app
+from services.auth_service import login_required
+
+
+def _view():
+    return 'admin page'
+
+
+class LoginRequiredTest(unittest.TestCase):
+    """login_required reads AUTH_DISABLED once, when it decorates the view."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def _decorate(self, flag):
+        with mock.patch.dict(os.environ, {'AUTH_DISABLED': flag}):
+            return login_required(_view)
+
+    def test_disabled_returns_view_unwrapped(self):
+        self.assertIs(self._decorate('1'), _view)
+
+    def test_flag_is_not_read_per_request(self):
+        view = self._decorate('0')
+        with mock.patch.dict(os.environ, {'AUTH_DISABLED': '1'}):
+            with self.app.test_request_context('/admin/'):
+                response = view()
+        self.assertEqual(response.status_code, 302)
+
+    def test_enabled_redirects_anonymous_user_to_login(self):
+        view = self._decorate('0')
+        with self.app.test_request_context('/admin/'):
+            response = view()
+            self.assertTrue(session['next_url'].endswith('/admin/'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith('/auth/login'))
+
+    def test_enabled_allows_logged_in_admin(self):
+        view = self._decorate('0')
+        with self.app.test_request_context('/admin/'):
+            session['admin_logged_in'] = True
+            self.assertEqual(view(), 'admin page')
+
+
+if __name__ == '__main__':
+    unittest.main()
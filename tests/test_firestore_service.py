@@ -0,0 +1,345 @@
+"""Tests for FirestoreService queries, in mock mode and against a fake client."""
+
+import operator
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+
+from services import firestore_service
+from services.firestore_service import FirestoreService
+
+_OPS = {'==': operator.eq, '>=': operator.ge, '<': operator.lt, 'in': lambda a, b: a in b}
+
+
+def _matches(doc, field, op, value):
+    # Like Firestore, range filters only match values of the same type
+    if field not in doc or (op != '==' and type(doc[field]) is not type(value)):
+        return False
+    return _OPS[op](doc[field], value)
+
+
+class _FakeAggregate:
+    def __init__(self, value):
+        self.value = value
+
+
+class _FakeDoc:
+    def __init__(self, data):
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class _FakeQuery:
+    """Evaluates where/order_by/limit/select over an in-memory list, recording the filters."""
+
+    def __init__(self, docs, log, filters=(), limit=None, fields=None, order=None):
+        self._docs, self._log = docs, log
+        self._filters, self._limit, self._fields, self._order = list(filters), limit, fields, order
+
+    def _copy(self, **changes):
+        state = dict(filters=self._filters, limit=self._limit, fields=self._fields, order=self._order)
+        state.update(changes)
+        return _FakeQuery(self._docs, self._log, **state)
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def order_by(self, field, direction=None):
+        return self._copy(order=(field, direction == 'DESCENDING'))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, fields):
+        return self._copy(fields=fields)
+
+    def count(self):
+        query = self
+
+        class _Count:
+            def get(self):
+                return [[_FakeAggregate(sum(1 for _ in query.stream()))]]
+        return _Count()
+
+    def stream(self):
+        self._log.append(self._filters)
+        matches = [d for d in self._docs if all(_matches(d, *f) for f in self._filters)]
+        if self._order:
+            field, descending = self._order
+            matches = [d for d in matches if field in d]
+            matches.sort(key=lambda d: d[field], reverse=descending)
+        else:
+            matches.sort(key=lambda d: d.get('geohash', ''))
+        for d in matches[:self._limit]:
+            yield _FakeDoc({k: d[k] for k in self._fields if k in d} if self._fields else d)
+
+
+class _FakeDB:
+    def __init__(self, docs):
+        self.docs, self.queries = docs, []
+
+    def collection(self, name):
+        return _FakeQuery(self.docs, self.queries)
+
+
+_BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _report(report_id, lat, lng, minutes, **extra):
+    report = {
+        'id': report_id, 'latitude': lat, 'longitude': lng,
+        'geohash': firestore_service.encode_geohash(lat, lng),
+        'created_at': _BASE_TIME + timedelta(minutes=minutes),
+        'status': 'new', 'issue_type': 'pothole',
+    }
+    report.update(extra)
+    return report
+
+
+BOUNDS = {'north': 12.99, 'south': 12.95, 'east': 77.61, 'west': 77.58}
+
+
+class EncodeGeohashTest(unittest.TestCase):
+
+    def test_float_noise_shares_a_cache_entry(self):
+        firestore_service._encode_geohash_cached.cache_clear()
+        first = firestore_service.encode_geohash(12.9716, 77.5946)
+        second = firestore_service.encode_geohash(12.9716 + 1e-12, 77.5946 - 1e-12)
+
+        self.assertEqual(first, second)
+        self.assertEqual(firestore_service._encode_geohash_cached.cache_info().hits, 1)
+
+
+class ReportsInBoundsTest(unittest.TestCase):
+
+    def test_mock_mode_filters_and_sorts_newest_first(self):
+        service = FirestoreService()
+        ids = []
+        for i in range(5):
+            ids.append(service.create_report({'latitude': 12.97 + i * 0.001, 'longitude': 77.59,
+                                              'issue_type': 'garbage' if i % 2 else 'pothole'}))
+            service._mock_reports[ids[-1]]['created_at'] = _BASE_TIME + timedelta(minutes=i)
+        service.create_report({'latitude': 40.0, 'longitude': -74.0, 'issue_type': 'pothole'})
+
+        reports = service.get_reports_in_bounds(BOUNDS, issue_type='pothole', limit=2)
+
+        self.assertEqual([r['id'] for r in reports], [ids[4], ids[2]])
+
+    def test_firestore_pushes_equality_filters_into_cell_queries(self):
+        # Many non-matching reports sort before the match in geohash order
+        docs = [_report(f'x{i}', 12.96, 77.59 + i * 1e-5, i, status='resolved') for i in range(10)]
+        docs.append(_report('match', 12.98, 77.60, 0))
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeDB(docs)
+
+        reports = service.get_reports_in_bounds(BOUNDS, status='new', limit=3, fields=['id'])
+
+        self.assertEqual([r['id'] for r in reports], ['match'])
+        for filters in service.db.queries:
+            self.assertIn(('status', '==', 'new'), filters)
+
+    def test_firestore_merges_cells_newest_first_with_one_limit(self):
+        docs = [_report(f'r{i}', 12.955 + i * 0.008, 77.59, i) for i in range(5)]
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeDB(docs)
+
+        reports = service.get_reports_in_bounds(BOUNDS, limit=3)
+
+        self.assertEqual([r['id'] for r in reports], ['r4', 'r3', 'r2'])
+
+
+class NearbyReportsTest(unittest.TestCase):
+    """Every nearby search runs bounded geohash queries, never a full scan."""
+
+    def _service(self, docs):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeDB(docs)
+        return service
+
+    def _assert_bounded(self, service):
+        self.assertTrue(service.db.queries)
+        for filters in service.db.queries:
+            self.assertIn('geohash', [field for field, _, _ in filters])
+
+    def test_antimeridian_search_covers_both_sides(self):
+        service = self._service([_report('east', 10.0, 179.99995, 0),
+                                 _report('west', 10.0, -179.99995, 1),
+                                 _report('far', 10.0, 170.0, 2)])
+
+        reports = service.find_nearby_reports(10.0, 179.99999, radius_meters=15)
+
+        self.assertEqual(sorted(r['id'] for r in reports), ['east', 'west'])
+        self._assert_bounded(service)
+
+    def test_oversized_radius_falls_back_to_the_center_cell(self):
+        service = self._service([_report('near', 12.97, 77.59, 0), _report('far', -33.9, 151.2, 1)])
+
+        reports = service.find_nearby_reports(12.97, 77.59, radius_meters=1e7)
+
+        self.assertEqual([r['id'] for r in reports], ['near'])
+        self._assert_bounded(service)
+
+    def test_search_at_the_pole_is_bounded(self):
+        service = self._service([_report('pole', 89.9999, 10.0, 0)])
+
+        reports = service.find_nearby_reports(90.0, 0.0, radius_meters=50)
+
+        self.assertEqual([r['id'] for r in reports], ['pole'])
+        self._assert_bounded(service)
+
+
+class ReportsVersionTest(unittest.TestCase):
+    """The listing freshness token follows the filtered reports."""
+
+    def setUp(self):
+        patcher = mock.patch.object(firestore_service, 'firestore',
+                                    mock.Mock(Query=mock.Mock(DESCENDING='DESCENDING')), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.docs = [_report(f'r{i}', 12.97, 77.59, i, updated_at=_BASE_TIME + timedelta(minutes=i))
+                     for i in range(3)]
+        self.docs[2]['status'] = 'resolved'
+        self.service = FirestoreService()
+        self.service.enabled, self.service.db = True, _FakeDB(self.docs)
+
+    def test_version_uses_filtered_count_and_latest_update(self):
+        version = self.service.get_reports_version(status='new')
+
+        self.assertEqual(version, f"2:{(_BASE_TIME + timedelta(minutes=1)).isoformat()}")
+        for filters in self.service.db.queries:
+            self.assertIn(('status', '==', 'new'), filters)
+
+    def test_version_changes_when_an_older_report_is_deleted(self):
+        before = self.service.get_reports_version()
+        del self.docs[0]
+        self.assertNotEqual(self.service.get_reports_version(), before)
+
+
+class StatsTest(unittest.TestCase):
+    """Reports missing a bucketed field count towards its default."""
+
+    REPORTS = [
+        {'id': 'a', 'status': 'verified', 'issue_type': 'pothole', 'severity': 'high'},
+        {'id': 'b', 'status': 'resolved', 'issue_type': 'garbage'},
+        {'id': 'c', 'severity': None},
+    ]
+    EXPECTED = {
+        'total': 3,
+        'by_status': {'new': 1, 'verified': 1, 'resolved': 1},
+        'by_type': {'pothole': 1, 'broken_light': 0, 'garbage': 1, 'waterlogging': 0, 'other': 1},
+        'by_severity': {'high': 1, 'medium': 2, 'low': 0},
+    }
+
+    def test_firestore_counts_missing_fields_as_default(self):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeDB([dict(r) for r in self.REPORTS])
+        self.assertEqual(service.get_stats(), self.EXPECTED)
+
+    def test_mock_mode_matches_firestore(self):
+        service = FirestoreService()
+        service._mock_reports = {r['id']: dict(r) for r in self.REPORTS}
+        self.assertEqual(service.get_stats(), self.EXPECTED)
+
+    def test_buckets_add_up_to_total(self):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeDB([dict(r) for r in self.REPORTS])
+        stats = service.get_stats()
+        for group in ('by_status', 'by_type', 'by_severity'):
+            self.assertEqual(sum(stats[group].values()), stats['total'])
+
+
+
+class _FakeDocRef:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class _FakeBulkWriter:
+    """Records creates and reports the configured IDs as failed on close."""
+
+    def __init__(self, db):
+        self._db, self._on_error = db, None
+
+    def on_write_error(self, callback):
+        self._on_error = callback
+
+    def create(self, ref, data):
+        self._db.created[ref.id] = dict(data)
+
+    def close(self):
+        if self._db.close_error:
+            raise self._db.close_error
+        for doc_id in self._db.fail_ids:
+            self._db.created.pop(doc_id, None)
+            failure = mock.Mock()
+            failure.operation.reference.id = doc_id
+            self._on_error(failure, self)
+
+
+class _FakeBulkDB:
+    def __init__(self, fail_ids=(), close_error=None):
+        self.created, self.fail_ids, self.close_error = {}, set(fail_ids), close_error
+        self._next_id = 0
+
+    def collection(self, name):
+        db = self
+
+        class _Collection:
+            def document(self):
+                db._next_id += 1
+                return _FakeDocRef(f'doc{db._next_id}')
+        return _Collection()
+
+    def bulk_writer(self):
+        return _FakeBulkWriter(self)
+
+
+class CreateReportsBulkTest(unittest.TestCase):
+
+    @staticmethod
+    def _reports(count):
+        return [{'latitude': 12.97 + i * 0.01, 'longitude': 77.59, 'issue_type': 'pothole'}
+                for i in range(count)]
+
+    def test_firestore_writes_every_report_with_client_ids(self):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeBulkDB()
+
+        ids = service.create_reports_bulk(self._reports(3))
+
+        self.assertEqual(ids, ['doc1', 'doc2', 'doc3'])
+        for doc_id in ids:
+            created = service.db.created[doc_id]
+            self.assertEqual(created['id'], doc_id)
+            self.assertEqual(created['status'], 'new')
+            self.assertIn('geohash', created)
+            self.assertIn('created_at', created)
+
+    def test_firestore_leaves_out_failed_writes(self):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeBulkDB(fail_ids={'doc2'})
+
+        self.assertEqual(service.create_reports_bulk(self._reports(3)), ['doc1', 'doc3'])
+
+    def test_firestore_writer_error_returns_no_ids(self):
+        service = FirestoreService()
+        service.enabled, service.db = True, _FakeBulkDB(close_error=RuntimeError('unavailable'))
+
+        self.assertEqual(service.create_reports_bulk(self._reports(2)), [])
+
+    def test_mock_mode_stores_and_indexes_reports(self):
+        service = FirestoreService()
+
+        ids = service.create_reports_bulk(self._reports(2))
+
+        self.assertEqual(len(ids), 2)
+        nearby = service.find_nearby_reports(12.97, 77.59, radius_meters=10)
+        self.assertEqual([r['id'] for r in nearby], [ids[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
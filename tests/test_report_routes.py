@@ -0,0 +1,191 @@
+"""Tests for report submission in mock mode."""
+
+import base64
+import io
+import time
+import unittest
+from unittest import mock
+
+from app import create_app
+from services.firestore_service import get_firestore_service
+from services.gemini_service import get_gemini_service
+from services.storage_service import StorageService
+
+# 1x1 transparent PNG
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+PNG_DATA_URL = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+
+
+class CreateReportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.firestore = get_firestore_service()
+        self.gemini = get_gemini_service()
+
+    def _post_form(self, data, filename):
+        return self.client.post('/api/reports', content_type='multipart/form-data', data={
+            'image': (io.BytesIO(data), filename), 'latitude': '12.9', 'longitude': '77.5'
+        })
+
+    def test_rejected_upload_skips_analysis_and_duplicate_query(self):
+        with mock.patch.object(self.gemini, 'analyze_image') as analyze, \
+                mock.patch.object(self.firestore, 'find_nearby_reports') as nearby:
+            bad_type = self._post_form(PNG, 'notes.txt')
+            with mock.patch.object(StorageService, 'MAX_FILE_SIZE', len(PNG) - 1):
+                too_large = self._post_form(PNG, 'pothole.png')
+
+        self.assertEqual(bad_type.status_code, 400)
+        self.assertIn('Invalid file type', bad_type.get_json()['error'])
+        self.assertEqual(too_large.status_code, 400)
+        self.assertIn('File too large', too_large.get_json()['error'])
+        analyze.assert_not_called()
+        nearby.assert_not_called()
+
+    def test_valid_upload_creates_report(self):
+        response = self._post_form(PNG, 'pothole.png')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.get_json()['report']['image_url'].startswith('data:image/png;base64,'))
+
+
+class ForcedDuplicateCheckTest(unittest.TestCase):
+    """force=true reuses the signed duplicate check from /api/analyze."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.firestore = get_firestore_service()
+
+    def _analyze(self, lat, lng):
+        response = self.client.post(f'/api/analyze?latitude={lat}&longitude={lng}',
+                                    data=PNG, content_type='image/png')
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def _submit(self, lat, lng, **extra):
+        body = {'image': PNG_DATA_URL, 'latitude': lat, 'longitude': lng}
+        body.update(extra)
+        response = self.client.post('/api/reports', json=body)
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()
+
+    def test_preflight_result_replaces_nearby_query(self):
+        existing = self._submit(10.0, 70.0)['report']
+        preflight = self._analyze(10.00001, 70.00001)
+        self.assertEqual(preflight['duplicate_warning']['existing_report']['id'], existing['id'])
+
+        with mock.patch.object(self.firestore, 'find_nearby_reports') as nearby:
+            result = self._submit(10.00001, 70.00001, force=True, duplicate_check=preflight['duplicate_check'])
+
+        nearby.assert_not_called()
+        self.assertEqual(result['report']['potential_duplicate_of'], existing['id'])
+        self.assertEqual(result['duplicate_warning'], preflight['duplicate_warning'])
+
+    def test_preflight_without_duplicates_skips_query(self):
+        preflight = self._analyze(11.0, 71.0)
+        with mock.patch.object(self.firestore, 'find_nearby_reports') as nearby:
+            result = self._submit(11.0, 71.0, force=True, duplicate_check=preflight['duplicate_check'])
+        nearby.assert_not_called()
+        self.assertNotIn('potential_duplicate_of', result['report'])
+
+    def test_preflight_for_another_location_is_ignored(self):
+        existing = self._submit(12.0, 72.0)['report']
+        preflight = self._analyze(40.0, -74.0)
+        result = self._submit(12.00001, 72.00001, force=True, duplicate_check=preflight['duplicate_check'])
+        self.assertEqual(result['report']['potential_duplicate_of'], existing['id'])
+
+    def test_forged_or_expired_token_still_checks(self):
+        token = self._analyze(13.0, 73.0)['duplicate_check']
+        with mock.patch.object(self.firestore, 'find_nearby_reports', return_value=[]) as nearby:
+            self._submit(13.0, 73.0, force=True, duplicate_check=token + 'x')
+            with mock.patch('itsdangerous.timed.time.time', return_value=time.time() + 3600):
+                self._submit(13.0, 73.0, force=True, duplicate_check=token)
+        self.assertEqual(nearby.call_count, 2)
+
+    def test_token_without_force_still_checks(self):
+        preflight = self._analyze(14.0, 74.0)
+        with mock.patch.object(self.firestore, 'find_nearby_reports', return_value=[]) as nearby:
+            self._submit(14.0, 74.0, duplicate_check=preflight['duplicate_check'])
+        nearby.assert_called_once()
+
+
+class ListReportsETagTest(unittest.TestCase):
+    """The listing ETag comes from a freshness query over the same filters."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.firestore = get_firestore_service()
+
+    def test_etag_revalidates_until_the_page_changes(self):
+        first = self.client.get('/api/reports?issue_type=etag-test')
+        etag = first.headers['ETag']
+
+        unchanged = self.client.get('/api/reports?issue_type=etag-test', headers={'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+
+        report_id = self.firestore.create_report({'latitude': 1.0, 'longitude': 1.0, 'issue_type': 'etag-test'})
+        added = self.client.get('/api/reports?issue_type=etag-test', headers={'If-None-Match': etag})
+        self.assertEqual(added.status_code, 200)
+        self.assertEqual(added.get_json()['count'], 1)
+
+        self.firestore.update_report(report_id, {'status': 'resolved'})
+        updated = self.client.get('/api/reports?issue_type=etag-test',
+                                  headers={'If-None-Match': added.headers['ETag']})
+        self.assertEqual(updated.status_code, 200)
+
+    def test_deleted_report_invalidates_etag(self):
+        self.firestore.create_report({'latitude': 2.0, 'longitude': 2.0, 'issue_type': 'etag-delete'})
+        older = self.firestore.create_report({'latitude': 2.0, 'longitude': 2.0, 'issue_type': 'etag-delete'})
+        etag = self.client.get('/api/reports?issue_type=etag-delete').headers['ETag']
+
+        self.firestore.delete_report(older)
+        response = self.client.get('/api/reports?issue_type=etag-delete', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['count'], 1)
+
+    def test_matching_etag_skips_the_listing_query(self):
+        etag = self.client.get('/api/reports?status=new').headers['ETag']
+        with mock.patch.object(self.firestore, 'get_all_reports') as listing:
+            response = self.client.get('/api/reports?status=new', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        listing.assert_not_called()
+
+
+
+class NearbyReportsRouteTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = create_app()
+
+    def setUp(self):
+        self.client = self.app.test_client()
+
+    def test_non_finite_values_are_rejected(self):
+        for query in ('lat=12.9&lng=77.5&radius=nan', 'lat=inf&lng=77.5', 'lat=12.9&lng=-inf'):
+            response = self.client.get(f'/api/reports/nearby?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_radius_is_clamped(self):
+        with mock.patch.object(get_firestore_service(), 'find_nearby_reports', return_value=[]) as nearby:
+            response = self.client.get('/api/reports/nearby?lat=12.9&lng=77.5&radius=1e7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['radius'], 5000)
+        nearby.assert_called_once_with(12.9, 77.5, 5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+"""Tests for StorageService in mock mode and against a fake GCS bucket."""
+
+import io
+import os
+import threading
+import unittest
+from unittest import mock
+
+from services import storage_service
+from services.storage_service import StorageService
+
+
+class GetStorageServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        storage_service.get_storage_service.cache_clear()
+        self.addCleanup(storage_service.get_storage_service.cache_clear)
+
+    def test_concurrent_calls_share_one_service(self):
+        built = []
+        original_init = StorageService.__init__
+
+        def counting_init(service):
+            built.append(service)
+            original_init(service)
+
+        with mock.patch.object(StorageService, '__init__', counting_init):
+            first = storage_service.get_storage_service()
+            results = []
+            threads = [threading.Thread(target=lambda: results.append(storage_service.get_storage_service()))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(built, [first])
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(result is first for result in results))
+
+
+class ClientSessionTest(unittest.TestCase):
+    """The GCS client is given a session carrying the pooled, retrying adapter."""
+
+    def test_client_uses_session_with_retrying_adapter(self):
+        creds = mock.Mock(name='credentials')
+        gcs = mock.Mock(name='storage')
+        gcs.Client.SCOPE = ('https://www.googleapis.com/auth/devstorage.full_control',)
+        google = mock.Mock(name='google')
+        google.auth.default.return_value = (creds, 'detected-project')
+        session_class = mock.Mock(name='AuthorizedSession')
+        adapter_class = mock.Mock(name='HTTPAdapter')
+        environ = {'GOOGLE_CLOUD_PROJECT': 'test-project', 'GCS_BUCKET': 'test-bucket'}
+
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.multiple(storage_service, create=True, GCS_AVAILABLE=True, GCS_WARMUP=False,
+                                    storage=gcs, google=google, AuthorizedSession=session_class,
+                                    with_scopes_if_required=lambda c, scopes: c,
+                                    HTTPAdapter=adapter_class, Retry=mock.Mock(name='Retry')):
+            for name in ('FIREBASE_PRIVATE_KEY', 'FIREBASE_CLIENT_EMAIL'):
+                os.environ.pop(name, None)
+            service = StorageService()
+
+        self.assertTrue(service.enabled)
+        google.auth.default.assert_called_once_with(scopes=gcs.Client.SCOPE)
+        session_class.assert_called_once_with(creds)
+        session = session_class.return_value
+        session.mount.assert_called_once_with('https://', adapter_class.return_value)
+        gcs.Client.assert_called_once_with(project='test-project', credentials=creds, _http=session)
+
+
+class _NotFound(Exception):
+    pass
+
+
+class _FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name, self.content_type = bucket, name, None
+
+    @property
+    def public_url(self):
+        return f'https://storage.googleapis.com/test-bucket/{self.name}'
+
+    def upload_from_file(self, file_obj, size=None, content_type=None, checksum=None):
+        data = file_obj.read()
+        if data == b'fail':
+            raise ConnectionError('upload reset')
+        self.bucket.objects[self.name] = data
+
+    def make_public(self):
+        pass
+
+    def delete(self):
+        if self.bucket.pending is not None:
+            self.bucket.pending.append(self.name)
+        elif self.name in self.bucket.delete_errors:
+            raise self.bucket.delete_errors[self.name]
+        elif self.bucket.objects.pop(self.name, None) is None:
+            raise _NotFound(self.name)
+
+
+class _FakeBucket:
+    def __init__(self):
+        self.objects, self.delete_errors = {}, {}
+        self.pending = None
+
+    def blob(self, name):
+        return _FakeBlob(self, name)
+
+
+class _FakeBatch:
+    """Sends the queued deletes on exit; a failing batch only applies some of them."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __enter__(self):
+        self.client.bucket.pending = []
+
+    def __exit__(self, *exc_info):
+        bucket, names = self.client.bucket, self.client.bucket.pending
+        bucket.pending = None
+        self.client.batches.append(names)
+        for name in names[:self.client.applied_before_failure]:
+            bucket.objects.pop(name, None)
+        if self.client.applied_before_failure is not None:
+            raise RuntimeError('batch request failed')
+
+
+class _FakeClient:
+    def __init__(self, bucket, applied_before_failure=None):
+        self.bucket, self.applied_before_failure = bucket, applied_before_failure
+        self.batches = []
+
+    def batch(self):
+        return _FakeBatch(self)
+
+
+def _gcs_service(**client_options):
+    service = StorageService()
+    bucket = _FakeBucket()
+    service.enabled, service.bucket = True, bucket
+    service.client = _FakeClient(bucket, **client_options)
+    service.bucket_name, service._bucket_prefix = 'test-bucket', 'test-bucket/'
+    return service, bucket
+
+
+class UploadImagesBatchTest(unittest.TestCase):
+
+    def test_mock_mode_keeps_input_order_and_reports_each_failure(self):
+        service = StorageService()
+
+        results = service.upload_images_batch([
+            (b'png bytes', 'a.png'),
+            (b'text', 'notes.txt'),
+            (io.BytesIO(b'gif bytes'), 'b.gif', 'image/gif'),
+            (b'x' * (StorageService.MAX_FILE_SIZE + 1), 'big.jpg'),
+        ])
+
+        self.assertEqual([ok for ok, _ in results], [True, False, True, False])
+        self.assertTrue(results[0][1].startswith('data:image/png;base64,'))
+        self.assertIn('Invalid file type', results[1][1])
+        self.assertTrue(results[2][1].startswith('data:image/gif;base64,'))
+        self.assertIn('File too large', results[3][1])
+
+    def test_gcs_failure_does_not_affect_other_uploads(self):
+        service, bucket = _gcs_service()
+
+        results = service.upload_images_batch([(b'one', 'a.png'), (b'fail', 'b.png'), (b'three', 'c.jpg')])
+
+        self.assertEqual([ok for ok, _ in results], [True, False, True])
+        self.assertIn('upload reset', results[1][1])
+        self.assertEqual(sorted(bucket.objects.values()), [b'one', b'three'])
+        self.assertTrue(results[2][1].endswith('.jpg'))
+
+
+class DeleteImagesTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(storage_service, 'NotFound', _NotFound, create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _store(bucket, count):
+        names = [f'reports/img{i}.png' for i in range(count)]
+        bucket.objects.update((name, b'x') for name in names)
+        return [f'https://storage.googleapis.com/test-bucket/{name}' for name in names]
+
+    def test_mock_mode_always_succeeds(self):
+        self.assertEqual(StorageService().delete_images(['a', 'b']), [True, True])
+
+    def test_deletes_in_batches_of_100(self):
+        service, bucket = _gcs_service()
+        urls = self._store(bucket, 150)
+
+        self.assertEqual(service.delete_images(urls), [True] * 150)
+        self.assertEqual([len(names) for names in service.client.batches], [100, 50])
+        self.assertEqual(bucket.objects, {})
+
+    def test_failed_batch_falls_back_to_single_deletes(self):
+        # The batch removes img0 before failing; img1 is retried; img2 stays forbidden
+        service, bucket = _gcs_service(applied_before_failure=1)
+        urls = self._store(bucket, 3)
+        bucket.delete_errors['reports/img2.png'] = PermissionError('forbidden')
+
+        self.assertEqual(service.delete_images(urls), [True, True, False])
+        self.assertEqual(list(bucket.objects), ['reports/img2.png'])
+
+    def test_parses_signed_and_firebase_urls(self):
+        service, bucket = _gcs_service()
+        bucket.objects.update({'reports/a b.png': b'x', 'reports/c.png': b'x'})
+
+        results = service.delete_images([
+            'https://firebasestorage.googleapis.com/v0/b/test-bucket/o/reports%2Fa%20b.png?alt=media',
+            'https://storage.googleapis.com/test-bucket/reports/c.png?X-Goog-Signature=abc',
+        ])
+
+        self.assertEqual(results, [True, True])
+        self.assertEqual(service.client.batches, [['reports/a b.png', 'reports/c.png']])
+
+
+if __name__ == '__main__':
+    unittest.main()